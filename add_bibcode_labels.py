@@ -1,19 +1,23 @@
 #!/usr/bin/env python3
 """
-Add bibcode_label column to software_mentions_all_individual_contexts.csv
-based on ASCL bibcode classifications in ascl_bibcodelabels.json
+Add bibcode_label column to the software_mentions_all export (Parquet, or the
+legacy gzipped CSV) based on ASCL bibcode classifications in ascl_bibcodelabels.json
 """
 
-import json
+import gzip
+import orjson
 import pandas as pd
+import pyarrow.parquet as pq
 from pathlib import Path
 from typing import Dict, Set
 import sys
 
+# Rows per chunk when streaming the input export
+CHUNK_SIZE = 200_000
+
 def load_bibcode_labels(json_path: Path) -> Dict[str, Set[str]]:
     """Load and flatten all bibcodes from the ASCL JSON file."""
-    with open(json_path, 'r') as f:
-        data = json.load(f)
+    data = orjson.loads(json_path.read_bytes())
     
     all_positive = set()
     all_negative = set()
@@ -32,21 +36,28 @@ def load_bibcode_labels(json_path: Path) -> Dict[str, Set[str]]:
         'uncurated': all_uncurated
     }
 
-def get_bibcode_label(bibcode: str, bibcode_sets: Dict[str, Set[str]]) -> str:
-    """Determine the label for a given bibcode."""
-    if bibcode in bibcode_sets['positive']:
-        return 'positive'
-    elif bibcode in bibcode_sets['negative']:
-        return 'negative'
-    elif bibcode in bibcode_sets['uncurated']:
-        return 'uncurated'
+def build_label_map(bibcode_sets: Dict[str, Set[str]]) -> Dict[str, str]:
+    """Build a bibcode -> label lookup with precedence positive > negative > uncurated."""
+    label_map = dict.fromkeys(bibcode_sets['uncurated'], 'uncurated')
+    label_map.update(dict.fromkeys(bibcode_sets['negative'], 'negative'))
+    label_map.update(dict.fromkeys(bibcode_sets['positive'], 'positive'))
+    return label_map
+
+def iter_mention_chunks(input_path: Path):
+    """Yield DataFrame chunks of the extraction export, from Parquet or gzipped CSV."""
+    if input_path.suffix == '.parquet':
+        for batch in pq.ParquetFile(input_path).iter_batches(batch_size=CHUNK_SIZE):
+            yield batch.to_pandas()
     else:
-        return 'unknown'
+        yield from pd.read_csv(input_path, compression='gzip', chunksize=CHUNK_SIZE, dtype={'bibcode': 'string'})
 
 def main():
-    # Paths - use the full gzipped dataset
+    # Paths - use the full dataset; run_extraction.py writes the Parquet export by default,
+    # the gzipped CSV only with --export-single-csv
     json_path = Path('ontologies/ASCL/ascl_bibcodelabels.json')
+    parquet_path = Path('optimized_extractor/results/exports/software_mentions_all.parquet')
     csv_path = Path('optimized_extractor/results/exports/software_mentions_all.csv.gzip')
+    input_path = parquet_path if parquet_path.exists() else csv_path
     output_path = Path('optimized_extractor/results/exports/software_mentions_all_with_labels.csv.gzip')
     
     # Check if files exist
@@ -54,32 +65,38 @@ def main():
         print(f"❌ Error: JSON file not found at {json_path}")
         sys.exit(1)
     
-    if not csv_path.exists():
-        print(f"❌ Error: CSV file not found at {csv_path}")
+    if not input_path.exists():
+        print(f"❌ Error: extraction export not found at {parquet_path} or {csv_path}")
         sys.exit(1)
     
     print("📖 Loading bibcode classifications...")
     bibcode_sets = load_bibcode_labels(json_path)
+    label_map = build_label_map(bibcode_sets)
     
     print(f"Found {len(bibcode_sets['positive'])} positive bibcodes")
     print(f"Found {len(bibcode_sets['negative'])} negative bibcodes") 
     print(f"Found {len(bibcode_sets['uncurated'])} uncurated bibcodes")
     
-    print("📊 Loading CSV data...")
-    df = pd.read_csv(csv_path, compression='gzip')
-    print(f"Loaded {len(df):,} rows from CSV")
+    print(f"📊 Streaming {input_path} in chunks of {CHUNK_SIZE:,} rows...")
+    
+    total_rows = 0
+    label_counts = pd.Series(dtype='int64')
     
-    print("🏷️  Adding bibcode_label column...")
-    df['bibcode_label'] = df['bibcode'].apply(lambda x: get_bibcode_label(x, bibcode_sets))
+    print(f"🏷️  Adding bibcode_label column and writing to {output_path}...")
+    with gzip.open(output_path, 'wt', newline='') as out:
+        for i, chunk in enumerate(iter_mention_chunks(input_path)):
+            chunk['bibcode_label'] = chunk['bibcode'].map(label_map).fillna('unknown').astype('category')
+            chunk.to_csv(out, index=False, header=(i == 0))
+            
+            total_rows += len(chunk)
+            label_counts = label_counts.add(chunk['bibcode_label'].value_counts(), fill_value=0)
+    
+    print(f"Processed {total_rows:,} rows from {input_path.name}")
     
     # Show label distribution
-    label_counts = df['bibcode_label'].value_counts()
     print("\nLabel distribution:")
-    for label, count in label_counts.items():
-        print(f"  {label}: {count:,}")
-    
-    print(f"💾 Saving to {output_path}...")
-    df.to_csv(output_path, index=False, compression='gzip')
+    for label, count in label_counts.sort_values(ascending=False).items():
+        print(f"  {label}: {int(count):,}")
     
     print("✅ Done!")
 
@@ -1,29 +1,105 @@
 import os
+import hashlib
+import shelve
 import pandas as pd
+import torch
+from torch.utils.data import Dataset
 from transformers import pipeline, AutoTokenizer, AutoModelForTokenClassification
 
 # === Configuration ===
 CSV_FOLDER = "term_csv_files"
 OUTPUT_FOLDER = "annotated_csvs_indus"
 MODEL_NAME = "adsabs/nasa-smd-ibm-v0.1_NER_DEAL"
+BATCH_SIZE = 32
 
 # Create output folder if it doesn't exist
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
+# Entities per unique text, persisted so reruns and later CSVs skip completed work
+entity_cache = shelve.open(os.path.join(OUTPUT_FOLDER, "ner_cache"))
+
+def text_key(text):
+    # The model name is part of the key, so switching MODEL_NAME never reuses another model's entities
+    return f"{MODEL_NAME}:{hashlib.sha1(text.encode('utf-8')).hexdigest()}"
+
+# Half precision on GPU (bf16 where supported), full precision on CPU
+if torch.cuda.is_available():
+    DTYPE = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+else:
+    DTYPE = torch.float32
+
 # Load model and tokenizer
 tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-model = AutoModelForTokenClassification.from_pretrained(MODEL_NAME)
-ner_pipeline = pipeline("ner", model=model, tokenizer=tokenizer, aggregation_strategy="simple")
-
-# Function to run NER on a text field
-def extract_entities(text):
-    if pd.isna(text) or not isinstance(text, str) or not text.strip():
-        return []
-    try:
-        return [(e["word"], e["entity_group"], round(e["score"], 3)) for e in ner_pipeline(text)]
-    except Exception as e:
-        print(f"Error processing text: {e}")
-        return []
+model = AutoModelForTokenClassification.from_pretrained(MODEL_NAME, torch_dtype=DTYPE)
+model.eval()
+ner_pipeline = pipeline(
+    "ner",
+    model=model,
+    tokenizer=tokenizer,
+    aggregation_strategy="simple",
+    device=0 if torch.cuda.is_available() else -1,
+    batch_size=BATCH_SIZE
+)
+
+# Thin dataset wrapper so the pipeline can batch and prefetch inputs
+class TextDS(Dataset):
+    def __init__(self, texts):
+        self.texts = texts
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __getitem__(self, i):
+        return self.texts[i]
+
+# Order texts by token length so each batch pads to a similar length
+def length_sorted(indices, texts):
+    lengths = [len(ids) for ids in tokenizer([texts[i] for i in indices], add_special_tokens=False)["input_ids"]]
+    return [i for _, i in sorted(zip(lengths, indices))]
+
+# Function to run NER on a column of text fields (empty/missing texts get []);
+# duplicate texts share a single forward pass
+def extract_entities(texts):
+    results = [[] for _ in texts]
+    pending = {}
+    for i, t in enumerate(texts):
+        if not isinstance(t, str) or not t.strip():
+            continue
+        key = text_key(t)
+        if key in entity_cache:
+            results[i] = entity_cache[key]
+        else:
+            pending.setdefault(t, []).append(i)
+    if not pending:
+        return results
+
+    unique_texts = list(pending)
+    order = length_sorted(range(len(unique_texts)), unique_texts)
+    done = set()
+
+    def store(j, out):
+        entities = [(e["word"], e["entity_group"], round(e["score"], 3)) for e in out]
+        entity_cache[text_key(unique_texts[j])] = entities
+        for i in pending[unique_texts[j]]:
+            results[i] = entities
+        done.add(j)
+
+    with torch.inference_mode():
+        try:
+            outputs = ner_pipeline(TextDS([unique_texts[j] for j in order]), batch_size=BATCH_SIZE, num_workers=2)
+            for j, out in zip(order, outputs):
+                store(j, out)
+        except Exception as e:
+            # Retry what the batched pass did not finish one text at a time, so a bad text only loses itself
+            print(f"⚠️ Batched NER failed ({e}); retrying {len(order) - len(done)} texts individually")
+            for j in order:
+                if j in done:
+                    continue
+                try:
+                    store(j, ner_pipeline(unique_texts[j]))
+                except Exception as e:
+                    print(f"Error processing text: {e}")
+    return results
 
 # Process each CSV in the folder
 for filename in os.listdir(CSV_FOLDER):
@@ -37,11 +113,12 @@ for filename in os.listdir(CSV_FOLDER):
                 print(f"⚠️ Skipping {filename}: 'term_context' column not found")
                 continue
 
-            df["ner_entities"] = df["term_context"].apply(extract_entities)
+            df["ner_entities"] = extract_entities(df["term_context"].tolist())
             output_path = os.path.join(OUTPUT_FOLDER, filename)
             df.to_csv(output_path, index=False)
             print(f"✅ Saved: {output_path}")
         except Exception as e:
             print(f"❌ Failed to process {filename}: {e}")
 
+entity_cache.close()
 print("🎉 All files processed.")
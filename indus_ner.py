@@ -1,55 +1,75 @@
 # run_ner_indus.py
 
-import csv
+import pandas as pd
+import torch
 from transformers import pipeline
 from tqdm import tqdm
 
+BATCH_SIZE = 64
+
+# Half precision on GPU (bf16 where supported), full precision on CPU
+if torch.cuda.is_available():
+    DTYPE = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+else:
+    DTYPE = torch.float32
+
 # Set up INDUS NER model
-ner = pipeline("ner", model="adsabs/nasa-smd-ibm-v0.1_NER_DEAL", aggregation_strategy="simple")
-
-# Simulated function – replace this with real fulltext fetching logic
-def get_bibcode_context(bibcode):
-    return f"Simulated text mentioning {bibcode} with software like GALFIT or ZEUS."
-
-# Open input/output
-with open('positive_bibcodes.csv', newline='') as f_in, open('ner_results_indus.csv', 'w', newline='') as f_out:
-    reader = csv.DictReader(f_in)
-    writer = csv.DictWriter(f_out, fieldnames=[
-        'Term', 'Bibcode', 'Model', 'Success', 'Term Type', 'Context', 'Notes'
-    ])
-    writer.writeheader()
-
-    for row in tqdm(reader):
-        term = row['Term']
-        bibcode = row['Bibcode']
-        context = get_bibcode_context(bibcode)
-        model = "INDUS"
-        found = False
-        success = False
-        entity_type = "none"
-        notes = ""
-
-        try:
-            results = ner(context)
-            for r in results:
-                if r['word'].lower() == term.lower():
-                    found = True
-                    entity_type = r['entity_group']
-                    success = (entity_type.lower() == 'software')
-                    break
-            if not found:
-                notes = "Term not found in context"
-        except Exception as e:
-            notes = f"NER error: {e}"
-
-        writer.writerow({
-            'Term': term,
-            'Bibcode': bibcode,
-            'Model': model,
-            'Success': success,
-            'Term Type': entity_type,
-            'Context': context,
-            'Notes': notes
-        })
+ner = pipeline(
+    "ner",
+    model="adsabs/nasa-smd-ibm-v0.1_NER_DEAL",
+    aggregation_strategy="simple",
+    device=0 if torch.cuda.is_available() else -1,
+    batch_size=BATCH_SIZE,
+    torch_dtype=DTYPE
+)
+ner.model.eval()
+
+# Simulated context – replace this with real fulltext fetching logic
+def get_bibcode_contexts(bibcodes):
+    return "Simulated text mentioning " + bibcodes + " with software like GALFIT or ZEUS."
+
+# Return (found, entity_type) for the first entity whose text equals the term
+def match_term(term, entities):
+    term_lower = term.lower()
+    for r in entities:
+        if r['word'].lower() == term_lower:
+            return True, r['entity_group']
+    return False, "none"
+
+df = pd.read_csv('positive_bibcodes.csv', dtype=str, keep_default_na=False)
+df['Context'] = get_bibcode_contexts(df['Bibcode'])
+df['Model'] = "INDUS"
+
+# Run the whole column through the pipeline in batches; if a batch fails,
+# retry each context on its own so one bad row doesn't sink the rest
+contexts = df['Context'].tolist()
+with torch.inference_mode():
+    try:
+        all_results = list(tqdm(ner(contexts, batch_size=BATCH_SIZE), total=len(contexts)))
+    except Exception as e:
+        print(f"⚠️ Batched NER failed ({e}); retrying {len(contexts)} contexts individually")
+        all_results = []
+        for context in tqdm(contexts):
+            try:
+                all_results.append(ner(context))
+            except Exception as row_error:
+                all_results.append(row_error)
+
+term_types, successes, notes = [], [], []
+for term, ents in zip(df['Term'], all_results):
+    if isinstance(ents, Exception):
+        term_types.append("none")
+        successes.append(False)
+        notes.append(f"NER error: {ents}")
+        continue
+    found, entity_type = match_term(term, ents)
+    term_types.append(entity_type)
+    successes.append(entity_type.lower() == 'software')
+    notes.append("" if found else "Term not found in context")
+df['Term Type'] = term_types
+df['Success'] = successes
+df['Notes'] = notes
+
+df[['Term', 'Bibcode', 'Model', 'Success', 'Term Type', 'Context', 'Notes']].to_csv('ner_results_indus.csv', index=False)
 
 print("✅ NER results written to ner_results_indus.csv")
@@ -1,13 +1,30 @@
 import pandas as pd
+import torch
 from transformers import AutoTokenizer, AutoModelForTokenClassification, pipeline
 
+BATCH_SIZE = 32
+
 # Load CSV
 df = pd.read_csv("zeus_negative_bibcodes.csv")  # Change this path as needed
 
+# Half precision on GPU (bf16 where supported), full precision on CPU
+if torch.cuda.is_available():
+    DTYPE = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+else:
+    DTYPE = torch.float32
+
 # Load model and tokenizer
 tokenizer = AutoTokenizer.from_pretrained("oeg/software_benchmark_multidomain")
-model = AutoModelForTokenClassification.from_pretrained("oeg/software_benchmark_multidomain")
-ner_pipeline = pipeline("ner", model=model, tokenizer=tokenizer, aggregation_strategy="simple")
+model = AutoModelForTokenClassification.from_pretrained("oeg/software_benchmark_multidomain", torch_dtype=DTYPE)
+model.eval()
+ner_pipeline = pipeline(
+    "ner",
+    model=model,
+    tokenizer=tokenizer,
+    aggregation_strategy="simple",
+    device=0 if torch.cuda.is_available() else -1,
+    batch_size=BATCH_SIZE
+)
 
 # Chunking helper: splits text into smaller segments
 def chunk_text(text, max_tokens=512, overlap=50):
@@ -21,27 +38,57 @@ def chunk_text(text, max_tokens=512, overlap=50):
         start += max_tokens - overlap
     return chunks
 
-# Apply NER to each row with chunking
-def extract_entities(row):
-    text = row["term_context"]
-    if pd.isna(text) or not isinstance(text, str) or not text.strip():
-        return []
-    
-    entities = []
-    chunks = chunk_text(text)
-    for chunk in chunks:
-        try:
-            chunk_entities = ner_pipeline(chunk)
-            entities.extend([(e["word"], e["entity_group"], round(e["score"], 4)) for e in chunk_entities])
-        except Exception as e:
-            print(f"NER error on chunk: {e}")
+# Order texts by token length so each batch pads to a similar length
+def length_sorted(indices, texts):
+    lengths = [len(ids) for ids in tokenizer([texts[i] for i in indices], add_special_tokens=False)["input_ids"]]
+    return [i for _, i in sorted(zip(lengths, indices))]
+
+# Flatten the chunks of every unique text into one list, run the pipeline once
+# and scatter entities back to their owning rows (in original chunk order)
+def extract_entities(texts):
+    unique_texts = {}
+    row_owner = [None] * len(texts)
+    for row_idx, text in enumerate(texts):
+        if not isinstance(text, str) or not text.strip():
             continue
-    return entities
+        row_owner[row_idx] = unique_texts.setdefault(text, len(unique_texts))
+
+    all_chunks = []
+    owners = []
+    for text, owner in unique_texts.items():
+        for chunk in chunk_text(text):
+            all_chunks.append(chunk)
+            owners.append(owner)
+
+    chunk_results = [[] for _ in all_chunks]
+    if all_chunks:
+        order = length_sorted(range(len(all_chunks)), all_chunks)
+        with torch.inference_mode():
+            # One pipeline call per batch, so a failure only affects that batch
+            for start in range(0, len(order), BATCH_SIZE):
+                batch = order[start:start + BATCH_SIZE]
+                try:
+                    outputs = ner_pipeline([all_chunks[i] for i in batch], batch_size=BATCH_SIZE)
+                except Exception:
+                    # Retry the batch chunk by chunk so only the failing chunk loses its entities
+                    outputs = []
+                    for i in batch:
+                        try:
+                            outputs.append(ner_pipeline(all_chunks[i]))
+                        except Exception as e:
+                            print(f"NER error on chunk: {e}")
+                            outputs.append([])
+                for i, chunk_entities in zip(batch, outputs):
+                    chunk_results[i] = [(e["word"], e["entity_group"], round(e["score"], 4)) for e in chunk_entities]
+
+    unique_entities = [[] for _ in unique_texts]
+    for owner, ents in zip(owners, chunk_results):
+        unique_entities[owner].extend(ents)
+    return [unique_entities[owner] if owner is not None else [] for owner in row_owner]
 
 # Run NER
-df["entities"] = df.apply(extract_entities, axis=1)
+df["entities"] = extract_entities(df["term_context"].tolist())
 
 # Save output
 df.to_csv("output_zeus_neg_ner_oeg.csv", index=False)
 print("✅ Saved to output_with_ner.csv")
-
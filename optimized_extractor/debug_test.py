@@ -82,8 +82,8 @@ def test_term_matching():
             if match_list:
                 term_name = test_terms[term_id]['title']
                 print(f"  MATCH: {term_id} ('{term_name}') - {len(match_list)} matches")
-                for match in match_list:
-                    print(f"    '{text[match.start():match.end()]}'")
+                for start, end in match_list:
+                    print(f"    '{text[start:end]}'")
 
 def test_simple_patterns():
     """Test simpler patterns that might match better."""
@@ -126,8 +126,8 @@ def test_simple_patterns():
                 if match_list:
                     term_name = simple_terms[term_id]['name']
                     print(f"  ✓ MATCH: {term_id} ('{term_name}') - {len(match_list)} matches")
-                    for match in match_list:
-                        print(f"    '{text[match.start():match.end()]}'")
+                    for start, end in match_list:
+                        print(f"    '{text[start:end]}'")
         else:
             print("  No matches found")
 
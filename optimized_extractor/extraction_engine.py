@@ -2,18 +2,32 @@
 """Parallel extraction engine for software mention contexts."""
 
 import json
+import os
 import re
+import shutil
 import orjson
 import multiprocessing as mp
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Set, Any, Optional
-import pandas as pd
+from typing import Dict, List, Set, Any, Iterable, Optional, Tuple
+import numpy as np
 import pyarrow as pa
+import pyarrow.compute as pc
 import pyarrow.parquet as pq
 from collections import defaultdict
 import logging
 from dataclasses import dataclass
 
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    import re2
+except ImportError:
+    re2 = None
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
@@ -31,13 +45,61 @@ class ExtractionResult:
     in_abstract: bool
     match_location: str
 
+# Dictionary-encoded string: low-cardinality columns repeated on every match
+# row, read back by pandas as category dtype
+DICT_STRING = pa.dictionary(pa.int32(), pa.string())
+
+# Column layout of the extracted-mentions Parquet file
+RESULT_SCHEMA = pa.schema([
+    ('term_id', DICT_STRING),
+    ('term_name', DICT_STRING),
+    ('bibcode', DICT_STRING),
+    ('title', pa.string()),
+    ('abstract', pa.string()),
+    ('context', pa.string()),
+    ('match_count', pa.int64()),
+    ('in_title', pa.bool_()),
+    ('in_abstract', pa.bool_()),
+    ('match_location', DICT_STRING),
+])
+
+def new_result_columns() -> Dict[str, list]:
+    """Empty per-column buffers for extraction results, in RESULT_SCHEMA order."""
+    return {name: [] for name in RESULT_SCHEMA.names}
+
+def count_substring_matches(column: pa.ChunkedArray, pattern: str) -> int:
+    """Count rows of a string column containing ``pattern``, ignoring case.
+
+    Dictionary-encoded chunks are matched once per distinct value and the
+    result is mapped back through the indices.
+    """
+    total = 0
+    for chunk in column.chunks:
+        if pa.types.is_dictionary(chunk.type):
+            mask = pc.take(pc.match_substring(chunk.dictionary, pattern, ignore_case=True),
+                           chunk.indices)
+        else:
+            mask = pc.match_substring(chunk, pattern, ignore_case=True)
+        total += pc.sum(mask).as_py() or 0
+    return total
+
 class TermMatcher:
-    """Efficient term matching with pre-compiled regex patterns."""
+    """Efficient term matching with pre-compiled regex patterns.
+
+    When pyahocorasick is installed, all term names are also loaded into a
+    single automaton so each text is scanned once regardless of how many terms
+    are requested; the per-term regexes remain the fallback. Without it, a
+    google-re2 Set (if available) prefilters which regexes are worth running.
+    """
     
     def __init__(self, terms_info: Dict[str, Dict]):
         self.terms_info = terms_info
         self.regex_cache = {}
+        self.caseless_cache = {}
+        self.term_names = {}
         self._compile_patterns()
+        self.automaton = self._build_automaton()
+        self.literal_set, self.literal_set_ids = self._build_literal_set()
     
     def _compile_patterns(self):
         """Pre-compile regex patterns for all terms."""
@@ -50,40 +112,151 @@ class TermMatcher:
                 # Extract just the main software name (before colon if present)
                 simple_name = term_name.split(':')[0].strip() if ':' in term_name else term_name
                 if simple_name:
-                    # Create case-insensitive word boundary pattern
+                    # Word boundary pattern, matched against lowercased text
                     escaped_term = re.escape(simple_name.lower())
                     pattern = rf'\b{escaped_term}\b'
-                    self.regex_cache[term_id] = re.compile(pattern, re.IGNORECASE)
+                    self.regex_cache[term_id] = re.compile(pattern)
+                    self.term_names[term_id] = simple_name.lower()
+    
+    def _build_automaton(self):
+        """Build an Aho-Corasick automaton over all lowercased term names."""
+        if ahocorasick is None:
+            logger.info("pyahocorasick not installed; using per-term regex matching")
+            return None
+        
+        # Several terms can share a name, so each keyword maps to all of them
+        name_to_ids = defaultdict(list)
+        for term_id, name in self.term_names.items():
+            name_to_ids[name].append(term_id)
+        
+        automaton = ahocorasick.Automaton()
+        for name, term_ids in name_to_ids.items():
+            automaton.add_word(name, (len(name), tuple(term_ids)))
+        automaton.make_automaton()
+        return automaton
+    
+    def _build_literal_set(self):
+        """Build an RE2 set of lowercased term literals for the regex fallback path."""
+        if self.automaton is not None or re2 is None:
+            return None, []
+        
+        # No word boundaries: the set only has to find a superset of the regex hits
+        literal_set = re2.Set.SearchSet(re2.Options())
+        term_ids = []
+        for term_id, name in self.term_names.items():
+            literal_set.Add(re2.escape(name))
+            term_ids.append(term_id)
+        literal_set.Compile()
+        return literal_set, term_ids
+    
+    @staticmethod
+    def _is_word_boundary(text: str, pos: int) -> bool:
+        """Mirror regex word-boundary semantics: word-ness differs around pos."""
+        before = pos > 0 and (text[pos - 1].isalnum() or text[pos - 1] == '_')
+        after = pos < len(text) and (text[pos].isalnum() or text[pos] == '_')
+        return before != after
+    
+    def candidate_terms(self, texts_lower: List[str], term_ids: List[str]) -> List[str]:
+        """Return the terms whose name occurs as a substring of any of the lowercased texts.
+        
+        A cheap superset of the terms find_matches can report, used to skip
+        documents that mention none of their assigned terms.
+        """
+        combined = '\n'.join(texts_lower)
+        return [term_id for term_id in term_ids 
+                if term_id in self.term_names and self.term_names[term_id] in combined]
     
-    def find_matches(self, text: str, term_ids: List[str]) -> Dict[str, List[re.Match]]:
-        """Find all matches for given terms in text."""
+    def find_matches(self, text: str, term_ids: List[str],
+                     text_lower: Optional[str] = None) -> Dict[str, List[Tuple[int, int]]]:
+        """Find all (start, end) match spans for given terms in text.
+        
+        Pass ``text_lower`` when the caller has already lowercased the text.
+        """
+        if text_lower is None:
+            text_lower = text.lower()
+        # lower() can change the length of some non-ASCII text, which would
+        # shift offsets; match case-insensitively on the original text instead
+        if len(text_lower) != len(text):
+            return self._find_matches_caseless(text, term_ids)
+        if self.automaton is None:
+            return self._find_matches_regex(text_lower, term_ids)
+        
+        matches = {term_id: [] for term_id in term_ids if term_id in self.regex_cache}
+        if not matches:
+            return matches
+        
+        last_end = {}
+        for end_idx, (length, ids) in self.automaton.iter(text_lower):
+            start, end = end_idx - length + 1, end_idx + 1
+            if not (self._is_word_boundary(text, start) and self._is_word_boundary(text, end)):
+                continue
+            for term_id in ids:
+                # Skip overlapping hits of the same term, as finditer would
+                if term_id in matches and start >= last_end.get(term_id, 0):
+                    matches[term_id].append((start, end))
+                    last_end[term_id] = end
+        return matches
+    
+    def _find_matches_regex(self, text_lower: str, term_ids: List[str]) -> Dict[str, List[Tuple[int, int]]]:
+        """Find matches by running each term's compiled regex over the lowercased text."""
+        # Deliberately one scan per term rather than a single alternation: re
+        # tries alternation branches in turn (no trie), callers pass only a
+        # document's few candidate terms, and a shared pattern would let one
+        # term's match consume text that overlaps another term's match.
+        
+        # One RE2 pass rules out the terms that cannot occur in this text
+        candidates = None
+        if self.literal_set is not None:
+            candidates = {self.literal_set_ids[i] for i in self.literal_set.Match(text_lower)}
+        
         matches = {}
         for term_id in term_ids:
             if term_id in self.regex_cache:
-                matches[term_id] = list(self.regex_cache[term_id].finditer(text))
+                if candidates is not None and term_id not in candidates:
+                    matches[term_id] = []
+                    continue
+                matches[term_id] = [m.span() for m in self.regex_cache[term_id].finditer(text_lower)]
+        return matches
+    
+    def _find_matches_caseless(self, text: str, term_ids: List[str]) -> Dict[str, List[Tuple[int, int]]]:
+        """Find matches with IGNORECASE regexes, compiled on first use."""
+        matches = {}
+        for term_id in term_ids:
+            if term_id in self.regex_cache:
+                if term_id not in self.caseless_cache:
+                    self.caseless_cache[term_id] = re.compile(
+                        self.regex_cache[term_id].pattern, re.IGNORECASE
+                    )
+                matches[term_id] = [m.span() for m in self.caseless_cache[term_id].finditer(text)]
         return matches
 
 class ContextExtractor:
     """Extract context windows around matches."""
     
+    @staticmethod
+    def build_word_index(text: str) -> Tuple[List[str], np.ndarray]:
+        """Split text into words and record each word's starting character offset."""
+        spans = [(m.group(), m.start()) for m in re.finditer(r'\S+', text)]
+        words = [word for word, _ in spans]
+        starts = np.fromiter((start for _, start in spans), dtype=np.int64, count=len(spans))
+        return words, starts
+    
     @staticmethod
     def extract_context_window(text: str, match_start: int, match_end: int, 
-                             window_words: int = 100) -> str:
-        """Extract context window of specified word count around match."""
-        # Simple word tokenization
-        words = text.split()
-        
-        # Find word positions
-        char_to_word = {}
-        char_pos = 0
-        for word_idx, word in enumerate(words):
-            for i in range(len(word)):
-                char_to_word[char_pos + i] = word_idx
-            char_pos += len(word) + 1  # +1 for space
-        
-        # Get word indices for match
-        start_word_idx = char_to_word.get(match_start, 0)
-        end_word_idx = char_to_word.get(match_end - 1, len(words) - 1)
+                             window_words: int = 100,
+                             word_index: Optional[Tuple[List[str], np.ndarray]] = None) -> str:
+        """Extract context window of specified word count around match.
+        
+        Pass a precomputed ``word_index`` from ``build_word_index`` when extracting
+        several windows from the same text so it is only tokenized once.
+        """
+        words, starts = word_index if word_index is not None else ContextExtractor.build_word_index(text)
+        if not words:
+            return ''
+        
+        # Binary-search the words containing the first and last matched characters
+        start_word_idx = max(0, int(np.searchsorted(starts, match_start, side='right')) - 1)
+        end_word_idx = max(0, int(np.searchsorted(starts, match_end - 1, side='right')) - 1)
         
         # Extract window
         context_start = max(0, start_word_idx - window_words)
@@ -102,8 +275,17 @@ class DocumentProcessor:
     def process_document(self, doc_data: Dict[str, Any], 
                         relevant_terms: List[str]) -> List[ExtractionResult]:
         """Process a single document and extract all relevant matches."""
-        results = []
+        columns = new_result_columns()
+        self.process_document_columnar(doc_data, relevant_terms, columns)
+        return [ExtractionResult(**dict(zip(columns, row))) for row in zip(*columns.values())]
+    
+    def process_document_columnar(self, doc_data: Dict[str, Any], 
+                                  relevant_terms: List[str],
+                                  columns: Dict[str, list]) -> int:
+        """Append one row per match to ``columns`` (keyed by RESULT_SCHEMA names).
         
+        Returns the number of rows appended.
+        """
         # Extract text fields and handle both strings and lists
         def extract_text_field(field_value):
             """Extract text from field that could be string, list, or None."""
@@ -121,112 +303,154 @@ class DocumentProcessor:
         body = extract_text_field(doc_data.get('body'))
         bibcode = doc_data.get('bibcode', '')
         
+        # Lowercase once per document; contexts still come from the original text
+        title_lower, abstract_lower, body_lower = title.lower(), abstract.lower(), body.lower()
+        
+        # Only terms whose name appears somewhere in the document need a full scan
+        candidates = self.matcher.candidate_terms(
+            [title_lower, abstract_lower, body_lower], relevant_terms
+        )
+        if not candidates:
+            return 0
+        
         # Find matches in each field
-        title_matches = self.matcher.find_matches(title, relevant_terms)
-        abstract_matches = self.matcher.find_matches(abstract, relevant_terms)
-        body_matches = self.matcher.find_matches(body, relevant_terms)
+        title_matches = self.matcher.find_matches(title, candidates, title_lower)
+        abstract_matches = self.matcher.find_matches(abstract, candidates, abstract_lower)
+        body_matches = self.matcher.find_matches(body, candidates, body_lower)
+        
+        fields = (('title', title, title_matches),
+                  ('abstract', abstract, abstract_matches),
+                  ('body', body, body_matches))
+        
+        # Tokenize a field only if it has matches, then reuse the index for each one
+        word_indexes = {
+            location: self.extractor.build_word_index(text)
+            for location, text, field_matches in fields
+            if any(field_matches.values())
+        }
+        
+        # Per-row values that vary; document-level values are filled in below
+        row_terms, row_names, row_contexts = [], [], []
+        row_in_title, row_in_abstract, row_locations = [], [], []
         
-        # Process each term
         for term_id in relevant_terms:
             if term_id not in self.terms_info:
                 continue
                 
             term_name = self.terms_info[term_id].get('name') or self.terms_info[term_id].get('title', '')
+            in_title = bool(title_matches.get(term_id))
+            in_abstract = bool(abstract_matches.get(term_id))
             
-            # Get all matches for this term
-            title_term_matches = title_matches.get(term_id, [])
-            abstract_term_matches = abstract_matches.get(term_id, [])
-            body_term_matches = body_matches.get(term_id, [])
-            
-            # Create result entry for each individual match
-            match_results = []
-            
-            # Process title matches
-            for match in title_term_matches:
-                context = self.extractor.extract_context_window(
-                    title, match.start(), match.end()
-                )
-                match_results.append({
-                    'location': 'title',
-                    'context': context,
-                    'match_count': 1,
-                    'in_title': True,
-                    'in_abstract': bool(abstract_term_matches),
-                    'in_body': bool(body_term_matches)
-                })
-            
-            # Process abstract matches
-            for match in abstract_term_matches:
-                context = self.extractor.extract_context_window(
-                    abstract, match.start(), match.end()
-                )
-                match_results.append({
-                    'location': 'abstract',
-                    'context': context,
-                    'match_count': 1,
-                    'in_title': bool(title_term_matches),
-                    'in_abstract': True,
-                    'in_body': bool(body_term_matches)
-                })
-            
-            # Process body matches
-            for match in body_term_matches:
-                context = self.extractor.extract_context_window(
-                    body, match.start(), match.end()
-                )
-                match_results.append({
-                    'location': 'body',
-                    'context': context,
-                    'match_count': 1,
-                    'in_title': bool(title_term_matches),
-                    'in_abstract': bool(abstract_term_matches),
-                    'in_body': True
-                })
-            
-            # Create ExtractionResult for each match
-            for match_result in match_results:
-                result = ExtractionResult(
-                    term_id=term_id,
-                    term_name=term_name,
-                    bibcode=bibcode,
-                    title=title,
-                    abstract=abstract,
-                    context=match_result['context'],
-                    match_count=match_result['match_count'],
-                    in_title=match_result['in_title'],
-                    in_abstract=match_result['in_abstract'],
-                    match_location=match_result['location']
-                )
-                
-                results.append(result)
+            # One row for each individual match
+            for location, text, field_matches in fields:
+                for match_start, match_end in field_matches.get(term_id, []):
+                    row_terms.append(term_id)
+                    row_names.append(term_name)
+                    row_contexts.append(self.extractor.extract_context_window(
+                        text, match_start, match_end, word_index=word_indexes[location]
+                    ))
+                    row_in_title.append(in_title)
+                    row_in_abstract.append(in_abstract)
+                    row_locations.append(location)
+        
+        # Extend only once the whole document succeeded so columns stay aligned
+        num_rows = len(row_terms)
+        columns['term_id'].extend(row_terms)
+        columns['term_name'].extend(row_names)
+        columns['bibcode'].extend([bibcode] * num_rows)
+        columns['title'].extend([title] * num_rows)
+        columns['abstract'].extend([abstract] * num_rows)
+        columns['context'].extend(row_contexts)
+        columns['match_count'].extend([1] * num_rows)
+        columns['in_title'].extend(row_in_title)
+        columns['in_abstract'].extend(row_in_abstract)
+        columns['match_location'].extend(row_locations)
         
-        return results
+        return num_rows
+
+def load_file_assignments(preprocessed_dir: Path) -> Dict[str, List[Dict]]:
+    """Load {filename: [assignment, ...]} written by save_preprocessing_results.
+    
+    Reads file_assignments.parquet, falling back to the older
+    file_assignments.json for preprocessing runs that predate it.
+    """
+    parquet_path = preprocessed_dir / 'file_assignments.parquet'
+    if not parquet_path.exists():
+        return orjson.loads((preprocessed_dir / 'file_assignments.json').read_bytes())
+    
+    table = pq.read_table(parquet_path)
+    columns = zip(*(table.column(name).to_pylist() 
+                    for name in ('filename', 'bibcode', 'byte_offset', 'line_number', 'year', 'terms')))
+    
+    file_assignments = defaultdict(list)
+    for filename, bibcode, byte_offset, line_number, year, terms in columns:
+        file_assignments[filename].append({
+            'bibcode': bibcode,
+            'byte_offset': byte_offset,
+            'line_number': line_number,
+            'year': year,
+            'terms': terms
+        })
+    return dict(file_assignments)
+
+# Read buffer for corpus files; assignments are visited in offset order
+READ_BUFFER_SIZE = 1 << 20
+
+# Per-process state populated by init_worker
+_WORKER_STATE = {}
+
+def init_worker(terms_info: Dict[str, Dict]):
+    """Pool initializer: build the DocumentProcessor once per worker process.
+
+    Under the fork start method the parent builds it before creating the pool,
+    so workers inherit the compiled matcher and skip this step entirely.
+    """
+    if 'processor' not in _WORKER_STATE:
+        _WORKER_STATE['processor'] = DocumentProcessor(terms_info)
+
+def worker_processor() -> 'DocumentProcessor':
+    """Return the DocumentProcessor built by init_worker in this process."""
+    return _WORKER_STATE['processor']
 
 def process_file_worker(args):
-    """Worker function for processing a single file."""
-    filename, assignments, terms_info, corpus_base_path, worker_id = args
+    """Worker function for processing a single file.
+    
+    Writes the file group's results to a Parquet shard in ``shard_dir`` and
+    returns its path, or None when nothing was extracted.
+    """
+    filename, assignments, corpus_base_path, shard_dir, worker_id = args
     
     logger.info(f"Worker {worker_id}: Processing {filename} with {len(assignments)} assignments")
     
-    processor = DocumentProcessor(terms_info)
-    results = []
+    processor = worker_processor()
+    columns = new_result_columns()
+    num_results = 0
     
     try:
         file_path = Path(corpus_base_path) / filename
         
-        with open(file_path, 'r', encoding='utf-8') as f:
+        # Visit lines in file order so reads stream forward instead of jumping around
+        assignments = sorted(assignments, key=lambda a: a['byte_offset'])
+        
+        # Binary mode: orjson parses the raw bytes, so lines are never decoded to str
+        with open(file_path, 'rb', buffering=READ_BUFFER_SIZE) as f:
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            
             for assignment in assignments:
                 try:
-                    # Seek to byte offset
-                    f.seek(assignment['byte_offset'])
+                    # Seek to byte offset (already there when lines are adjacent)
+                    if f.tell() != assignment['byte_offset']:
+                        f.seek(assignment['byte_offset'])
                     line = f.readline()
                     
                     # Parse JSON
                     doc_data = orjson.loads(line)
                     
                     # Process document
-                    doc_results = processor.process_document(doc_data, assignment['terms'])
-                    results.extend(doc_results)
+                    num_results += processor.process_document_columnar(
+                        doc_data, assignment['terms'], columns
+                    )
                     
                 except (json.JSONDecodeError, ValueError) as e:
                     logger.warning(f"Worker {worker_id}: JSON decode error for {assignment['bibcode']}: {e}")
@@ -236,106 +460,112 @@ def process_file_worker(args):
     except Exception as e:
         logger.error(f"Worker {worker_id}: Error processing file {filename}: {e}")
     
-    logger.info(f"Worker {worker_id}: Completed {filename}, extracted {len(results)} results")
-    return results
+    logger.info(f"Worker {worker_id}: Completed {filename}, extracted {num_results} results")
+    if num_results == 0:
+        return None
+    
+    shard_path = Path(shard_dir) / f'shard_{worker_id:05d}.parquet'
+    table = pa.Table.from_pydict(columns, schema=RESULT_SCHEMA)
+    pq.write_table(table, shard_path, compression='zstd')
+    return str(shard_path)
 
 class ExtractionEngine:
     """Main extraction engine coordinating parallel processing."""
     
-    def __init__(self, corpus_base_path: Path, num_workers: Optional[int] = None):
+    def __init__(self, corpus_base_path: Path, num_workers: Optional[int] = None,
+                 executor: str = 'process'):
+        """
+        Args:
+            corpus_base_path: Base directory of the corpus JSONL files
+            num_workers: Number of parallel workers (default: CPU count, max 32)
+            executor: 'process' for a multiprocessing pool, or 'thread' to share
+                one matcher across threads when matching releases the GIL
+        """
+        if executor not in ('process', 'thread'):
+            raise ValueError(f"Unknown executor: {executor!r}")
         self.corpus_base_path = corpus_base_path
         self.num_workers = num_workers or min(mp.cpu_count(), 32)
+        self.executor = executor
         
     def run_extraction(self, 
                       preprocessed_dir: Path,
                       output_dir: Path) -> Path:
         """Run the main extraction pipeline."""
-        logger.info(f"Starting extraction with {self.num_workers} workers")
+        logger.info(f"Starting extraction with {self.num_workers} {self.executor} workers")
         
         # Load preprocessing results
         logger.info("Loading preprocessing results")
-        with open(preprocessed_dir / 'terms_info.json', 'r') as f:
-            terms_info = json.load(f)
+        terms_info = orjson.loads((preprocessed_dir / 'terms_info.json').read_bytes())
+        file_assignments = load_file_assignments(preprocessed_dir)
         
-        with open(preprocessed_dir / 'file_assignments.json', 'r') as f:
-            file_assignments = json.load(f)
+        # Workers write per-file-group shards here; merged and removed at the end
+        shard_dir = output_dir / 'shards'
+        shard_dir.mkdir(parents=True, exist_ok=True)
         
         # Prepare worker arguments
         worker_args = []
         for worker_id, (filename, assignments) in enumerate(file_assignments.items()):
-            worker_args.append((filename, assignments, terms_info, 
-                              str(self.corpus_base_path), worker_id))
+            worker_args.append((filename, assignments, 
+                              str(self.corpus_base_path), str(shard_dir), worker_id))
         
         # Run parallel processing
         logger.info(f"Starting parallel processing with {len(worker_args)} file groups")
         
-        all_results = []
-        with mp.Pool(processes=self.num_workers) as pool:
-            worker_results = pool.map(process_file_worker, worker_args)
-            
-            # Flatten results
-            for results in worker_results:
-                all_results.extend(results)
-        
-        logger.info(f"Extraction completed. Total results: {len(all_results)}")
+        _WORKER_STATE.clear()
         
-        # Convert to DataFrame and save
-        output_dir.mkdir(parents=True, exist_ok=True)
-        return self._save_results(all_results, output_dir)
-    
-    def _save_results(self, results: List[ExtractionResult], output_dir: Path) -> Path:
-        """Save results to Parquet format."""
-        logger.info(f"Saving {len(results)} results to Parquet")
-        
-        # Handle empty results
-        if not results:
-            logger.warning("No results to save. Creating empty DataFrame with expected schema.")
-            # Create empty DataFrame with proper schema
-            df = pd.DataFrame(columns=[
-                'term_id', 'term_name', 'bibcode', 'title', 'abstract', 
-                'context', 'match_count', 'in_title', 'in_abstract', 'match_location'
-            ])
-            # Set proper dtypes
-            df = df.astype({
-                'term_id': 'string',
-                'term_name': 'string', 
-                'bibcode': 'string',
-                'title': 'string',
-                'abstract': 'string',
-                'context': 'string',
-                'match_count': 'int64',
-                'in_title': 'bool',
-                'in_abstract': 'bool',
-                'match_location': 'string'
-            })
+        if self.executor == 'thread':
+            # Threads share the one processor built here; no pickling or IPC
+            init_worker(terms_info)
+            with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+                shard_paths = executor.map(process_file_worker, worker_args)
+                parquet_path = self._save_results(shard_paths, output_dir)
         else:
-            # Convert to records
-            records = []
-            for result in results:
-                records.append({
-                    'term_id': result.term_id,
-                    'term_name': result.term_name,
-                    'bibcode': result.bibcode,
-                    'title': result.title,
-                    'abstract': result.abstract,
-                    'context': result.context,
-                    'match_count': result.match_count,
-                    'in_title': result.in_title,
-                    'in_abstract': result.in_abstract,
-                    'match_location': result.match_location
-                })
+            # With fork, build the matcher here so workers inherit it copy-on-write
+            if 'fork' in mp.get_all_start_methods():
+                ctx = mp.get_context('fork')
+                init_worker(terms_info)
+            else:
+                ctx = mp.get_context()
             
-            # Create DataFrame
-            df = pd.DataFrame(records)
+            with ctx.Pool(processes=self.num_workers, initializer=init_worker,
+                          initargs=(terms_info,)) as pool:
+                # Merge shards in submission order so row order is stable across runs
+                shard_paths = pool.imap(process_file_worker, worker_args)
+                parquet_path = self._save_results(shard_paths, output_dir)
+        _WORKER_STATE.clear()
+        shutil.rmtree(shard_dir, ignore_errors=True)
         
-        # Save as Parquet
+        return parquet_path
+    
+    def _save_results(self, shard_paths: Iterable[Optional[str]], output_dir: Path) -> Path:
+        """Stream worker shards into a single Parquet file, deleting each once merged."""
         parquet_path = output_dir / 'software_mentions_extracted.parquet'
-        df.to_parquet(parquet_path, compression='snappy', index=False)
+        logger.info(f"Writing results to {parquet_path}")
+        
+        total_rows = 0
+        unique_terms = set()
+        unique_bibcodes = set()
+        
+        # An empty run still produces a file with the expected schema
+        with pq.ParquetWriter(parquet_path, RESULT_SCHEMA, compression='zstd',
+                              use_dictionary=True, data_page_size=1 << 20) as writer:
+            for shard_path in shard_paths:
+                if shard_path is None:
+                    continue
+                table = pq.read_table(shard_path)
+                writer.write_table(table)
+                Path(shard_path).unlink()
+                total_rows += table.num_rows
+                unique_terms.update(table.column('term_id').unique().dictionary_decode().to_pylist())
+                unique_bibcodes.update(table.column('bibcode').unique().dictionary_decode().to_pylist())
+        
+        if total_rows == 0:
+            logger.warning("No results to save. Wrote empty Parquet file with expected schema.")
         
-        logger.info(f"Saved results to {parquet_path}")
-        logger.info(f"Result summary: {len(df)} total mentions, "
-                   f"{df['term_id'].nunique()} unique terms, "
-                   f"{df['bibcode'].nunique()} unique bibcodes")
+        logger.info(f"Extraction completed. Saved results to {parquet_path}")
+        logger.info(f"Result summary: {total_rows} total mentions, "
+                   f"{len(unique_terms)} unique terms, "
+                   f"{len(unique_bibcodes)} unique bibcodes")
         
         return parquet_path
 
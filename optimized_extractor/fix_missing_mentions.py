@@ -5,112 +5,157 @@ Fix missing mentions by re-extracting terms that only had title/abstract matches
 This addresses the bug where only body matches were being captured.
 """
 
-import pandas as pd
-import json
+import argparse
+import orjson
+import mmap
+import os
 import sqlite3
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 import logging
-from optimized_extractor.extraction_engine import DocumentProcessor
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from optimized_extractor.extraction_engine import (
+    RESULT_SCHEMA, count_substring_matches, init_worker, load_file_assignments, new_result_columns, worker_processor
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def find_missing_mentions():
-    """Re-extract mentions for all terms to capture title/abstract-only matches."""
+def _process_file(filename, assignments, corpus_base_path):
+    """Re-extract mentions for one corpus file. Returns (Arrow table, documents processed)."""
+    file_path = Path(corpus_base_path) / filename
     
-    # Load existing results
-    results_path = Path("optimized_extractor/results/exports/software_mentions_all.csv")
-    df = pd.read_csv(results_path)
+    if not file_path.exists():
+        logger.warning(f"File not found: {file_path}")
+        return RESULT_SCHEMA.empty_table(), 0
+        
+    logger.info(f"Processing {filename} with {len(assignments)} assignments")
     
-    logger.info(f"Current dataset has {len(df)} mentions")
+    processor = worker_processor()
+    columns = new_result_columns()
+    processed_count = 0
     
-    # Load terms info and preprocessing results
-    with open("optimized_extractor/results/preprocessed/terms_info.json", 'r') as f:
-        terms_info = json.load(f)
+    try:
+        with open(file_path, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # Assignments are sorted by byte offset, so pages are read in order
+            if hasattr(mm, 'madvise'):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            
+            for assignment in assignments:
+                try:
+                    # Read the document by slicing the line out of the mapping
+                    start = assignment['byte_offset']
+                    end = mm.find(b'\n', start)
+                    line = mm[start:end if end != -1 else len(mm)]
+                    doc_data = orjson.loads(line)
+                    
+                    # Extract with fixed logic, appending rows straight into the columns
+                    processor.process_document_columnar(doc_data, assignment['terms'], columns)
+                    
+                    processed_count += 1
+                    
+                except Exception as e:
+                    logger.error(f"Error processing {assignment['bibcode']}: {e}")
+                    
+    except Exception as e:
+        logger.error(f"Error processing file {filename}: {e}")
     
-    with open("optimized_extractor/results/preprocessed/file_assignments.json", 'r') as f:
-        file_assignments = json.load(f)
+    return pa.Table.from_pydict(columns, schema=RESULT_SCHEMA), processed_count
+
+def find_missing_mentions(export_csv: bool = False) -> Path:
+    """Re-extract mentions for all terms to capture title/abstract-only matches.
+    
+    Results are streamed to a Parquet file, one write per corpus file; set
+    ``export_csv`` to also write the CSV export. Returns the Parquet path.
+    """
+    
+    # Existing result count comes from the extraction Parquet footer; no rows are read
+    results_path = Path("optimized_extractor/results/software_mentions_extracted.parquet")
+    original_mentions = pq.read_metadata(results_path).num_rows
+    
+    logger.info(f"Current dataset has {original_mentions} mentions")
+    
+    # Load terms info and preprocessing results
+    preprocessed_dir = Path("optimized_extractor/results/preprocessed")
+    terms_info = orjson.loads((preprocessed_dir / 'terms_info.json').read_bytes())
+    file_assignments = load_file_assignments(preprocessed_dir)
     
     logger.info(f"Processing {len(terms_info)} terms across {len(file_assignments)} files")
     
-    # Set up document processor
-    processor = DocumentProcessor(terms_info)
     corpus_base_path = Path('/home/scixmuse/scix_data/ads_metadata_by_year_full/')
     
-    new_results = []
+    output_path = Path("optimized_extractor/results/exports/software_mentions_all_fixed.parquet")
+    total_mentions = 0
     processed_count = 0
     
-    # Process each file's assignments
-    for filename, assignments in file_assignments.items():
-        file_path = corpus_base_path / filename
-        
-        if not file_path.exists():
-            logger.warning(f"File not found: {file_path}")
-            continue
-            
-        logger.info(f"Processing {filename} with {len(assignments)} assignments")
-        
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                for assignment in assignments:
-                    try:
-                        # Read the document
-                        f.seek(assignment['byte_offset'])
-                        line = f.readline()
-                        doc_data = json.loads(line)
-                        
-                        # Extract with fixed logic
-                        doc_results = processor.process_document(doc_data, assignment['terms'])
-                        
-                        # Convert to records
-                        for result in doc_results:
-                            new_results.append({
-                                'term_id': result.term_id,
-                                'term_name': result.term_name,
-                                'bibcode': result.bibcode,
-                                'title': result.title,
-                                'abstract': result.abstract,
-                                'context': result.context,
-                                'match_count': result.match_count,
-                                'in_title': result.in_title,
-                                'in_abstract': result.in_abstract,
-                                'match_location': result.match_location
-                            })
-                        
-                        processed_count += 1
-                        if processed_count % 1000 == 0:
-                            logger.info(f"Processed {processed_count} documents, found {len(new_results)} mentions")
-                        
-                    except Exception as e:
-                        logger.error(f"Error processing {assignment['bibcode']}: {e}")
-                        
-        except Exception as e:
-            logger.error(f"Error processing file {filename}: {e}")
-    
-    logger.info(f"Extraction completed. Found {len(new_results)} total mentions")
-    
-    # Create new DataFrame
-    new_df = pd.DataFrame(new_results)
-    
-    # Save the corrected results
-    output_path = Path("optimized_extractor/results/exports/software_mentions_all_fixed.csv")
-    new_df.to_csv(output_path, index=False)
+    # Share the extraction engine's per-process DocumentProcessor; with fork it is
+    # built once here and inherited by every worker
+    if 'fork' in mp.get_all_start_methods():
+        ctx = mp.get_context('fork')
+        init_worker(terms_info)
+    else:
+        ctx = mp.get_context()
     
+    # Files are independent, so process them in parallel and write each as it finishes
+    with ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=ctx,
+                             initializer=init_worker, initargs=(terms_info,)) as executor, \
+            pq.ParquetWriter(output_path, RESULT_SCHEMA, compression='zstd') as writer:
+        futures = [
+            executor.submit(_process_file, filename, assignments, str(corpus_base_path))
+            for filename, assignments in file_assignments.items()
+        ]
+        for future in as_completed(futures):
+            table, file_count = future.result()
+            if table.num_rows:
+                writer.write_table(table)
+            total_mentions += table.num_rows
+            processed_count += file_count
+            logger.info(f"Processed {processed_count} documents, found {total_mentions} mentions")
+    
+    logger.info(f"Extraction completed. Found {total_mentions} total mentions")
     logger.info(f"Saved corrected results to {output_path}")
-    logger.info(f"Original mentions: {len(df)}")
-    logger.info(f"Fixed mentions: {len(new_df)}")
-    logger.info(f"Difference: +{len(new_df) - len(df)}")
     
-    return new_df
+    if export_csv:
+        # Stream record batches through Arrow's CSV writer; no DataFrame is built
+        csv_path = output_path.with_suffix('.csv')
+        parquet_file = pq.ParquetFile(output_path)
+        with pa_csv.CSVWriter(csv_path, parquet_file.schema_arrow) as csv_writer:
+            for batch in parquet_file.iter_batches():
+                csv_writer.write_batch(batch)
+        logger.info(f"Exported CSV to {csv_path}")
+    
+    logger.info(f"Original mentions: {original_mentions}")
+    logger.info(f"Fixed mentions: {total_mentions}")
+    logger.info(f"Difference: +{total_mentions - original_mentions}")
+    
+    return output_path
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Re-extract software mentions missed by the body-only extraction"
+    )
+    parser.add_argument(
+        '--export-csv',
+        action='store_true',
+        help='Also write software_mentions_all_fixed.csv next to the Parquet output'
+    )
+    return parser.parse_args()
 
 def main():
     """Main function."""
+    args = parse_arguments()
     logger.info("Starting missing mentions fix...")
-    new_df = find_missing_mentions()
+    output_path = find_missing_mentions(export_csv=args.export_csv)
     
     # Quick verification with pixell
-    pixell_results = new_df[new_df['term_name'].str.contains('Pixell', case=False, na=False)]
-    logger.info(f"Pixell mentions in fixed dataset: {len(pixell_results)}")
+    term_names = pq.read_table(output_path, columns=['term_name'])['term_name']
+    pixell_count = count_substring_matches(term_names, 'Pixell')
+    logger.info(f"Pixell mentions in fixed dataset: {pixell_count}")
     
     logger.info("Fix completed!")
 
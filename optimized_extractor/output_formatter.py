@@ -5,11 +5,25 @@ import pandas as pd
 from pathlib import Path
 import logging
 from typing import Optional
+import pyarrow as pa
+import pyarrow.compute as pc
 import pyarrow.parquet as pq
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+def _csv_compression(compression: Optional[str]):
+    """pandas compression argument; gzip uses a fast level instead of the default 9."""
+    if compression == 'gzip':
+        return {'method': 'gzip', 'compresslevel': 1}
+    return compression
+
+def _decode(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    """Plain values for a possibly dictionary-encoded column."""
+    if pa.types.is_dictionary(column.type):
+        return column.cast(column.type.value_type)
+    return column
+
 class OutputFormatter:
     """Handle different output format conversions and exports."""
     
@@ -21,6 +35,9 @@ class OutputFormatter:
         """Load the Parquet data."""
         logger.info(f"Loading data from {self.parquet_path}")
         self.df = pd.read_parquet(self.parquet_path)
+        # Low-cardinality columns; already categorical when the file is dictionary-encoded
+        for col in ('term_id', 'term_name', 'match_location'):
+            self.df[col] = self.df[col].astype('category')
         logger.info(f"Loaded {len(self.df)} records")
         
     def export_single_csv(self, output_path: Path, compression: Optional[str] = 'gzip'):
@@ -32,13 +49,40 @@ class OutputFormatter:
         
         if compression:
             output_path = output_path.with_suffix(f'.csv.{compression}')
-            self.df.to_csv(output_path, index=False, compression=compression)
+            self.df.to_csv(output_path, index=False, compression=_csv_compression(compression))
         else:
             self.df.to_csv(output_path, index=False)
             
         logger.info(f"Exported {len(self.df)} records to {output_path}")
         return output_path
     
+    def export_single_parquet(self, output_path: Path, row_group_size: int = 256_000):
+        """Export all data to a single zstd Parquet file, streamed batch by batch."""
+        output_path = output_path.with_suffix('.parquet')
+        logger.info(f"Exporting single Parquet file to {output_path}")
+        
+        parquet_file = pq.ParquetFile(self.parquet_path)
+        with pq.ParquetWriter(output_path, parquet_file.schema_arrow,
+                              compression='zstd', compression_level=3) as writer:
+            for batch in parquet_file.iter_batches(batch_size=row_group_size):
+                writer.write_batch(batch, row_group_size=row_group_size)
+        
+        logger.info(f"Exported {parquet_file.metadata.num_rows} records to {output_path}")
+        return output_path
+    
+    def export_feather(self, output_path: Path, compression: str = 'zstd'):
+        """Export all data to a single Feather file."""
+        if self.df is None:
+            self.load_data()
+            
+        output_path = output_path.with_suffix('.feather')
+        logger.info(f"Exporting Feather file to {output_path}")
+        
+        self.df.to_feather(output_path, compression=compression, compression_level=3)
+            
+        logger.info(f"Exported {len(self.df)} records to {output_path}")
+        return output_path
+    
     def export_csv_by_term(self, output_dir: Path, compression: Optional[str] = 'gzip'):
         """Export separate CSV files for each term."""
         if self.df is None:
@@ -47,11 +91,10 @@ class OutputFormatter:
         output_dir.mkdir(parents=True, exist_ok=True)
         logger.info(f"Exporting CSVs by term to {output_dir}")
         
-        unique_terms = self.df['term_id'].unique()
         exported_files = []
         
-        for term_id in unique_terms:
-            term_data = self.df[self.df['term_id'] == term_id]
+        # One grouping pass instead of a full boolean mask per term
+        for term_id, term_data in self.df.groupby('term_id', sort=False, observed=True):
             
             # Create safe filename
             safe_term_id = str(term_id).replace('/', '_').replace('\\', '_')
@@ -63,7 +106,7 @@ class OutputFormatter:
             file_path = output_dir / filename
             
             if compression:
-                term_data.to_csv(file_path, index=False, compression=compression)
+                term_data.to_csv(file_path, index=False, compression=_csv_compression(compression))
             else:
                 term_data.to_csv(file_path, index=False)
                 
@@ -73,22 +116,40 @@ class OutputFormatter:
         return exported_files
     
     def export_summary_stats(self, output_path: Path):
-        """Export summary statistics."""
-        if self.df is None:
-            self.load_data()
-            
+        """Export summary statistics, computed with Arrow kernels on the Parquet data."""
         logger.info(f"Generating summary statistics")
         
+        columns = ['term_id', 'term_name', 'bibcode', 'match_count', 
+                   'in_title', 'in_abstract', 'match_location']
+        table = pq.read_table(self.parquet_path, columns=columns)
+        # Decode dictionary columns so every chunk shares one value space
+        table = pa.table({name: _decode(table[name]) for name in columns})
+        
+        per_bibcode = table.group_by('bibcode').aggregate([('match_count', 'sum')])
+        locations = pc.value_counts(table['match_location'])
+        location_counts = sorted(zip(locations.field('values').to_pylist(), 
+                                     locations.field('counts').to_pylist()), 
+                                 key=lambda item: item[1], reverse=True)
+        top_terms = (table.group_by(['term_id', 'term_name'])
+                     .aggregate([('term_id', 'count')])
+                     .sort_by([('term_id_count', 'descending')])
+                     .slice(0, 20))
+        
         # Calculate statistics
         stats = {
-            'total_mentions': len(self.df),
-            'unique_terms': self.df['term_id'].nunique(),
-            'unique_bibcodes': self.df['bibcode'].nunique(),
-            'avg_matches_per_bibcode': self.df.groupby('bibcode')['match_count'].sum().mean(),
-            'mentions_by_location': self.df['match_location'].value_counts().to_dict(),
-            'top_terms_by_mentions': self.df.groupby(['term_id', 'term_name']).size().nlargest(20).reset_index().to_dict('records'),
-            'mentions_with_title_presence': self.df['in_title'].sum(),
-            'mentions_with_abstract_presence': self.df['in_abstract'].sum()
+            'total_mentions': table.num_rows,
+            'unique_terms': pc.count_distinct(table['term_id']).as_py(),
+            'unique_bibcodes': pc.count_distinct(table['bibcode']).as_py(),
+            'avg_matches_per_bibcode': pc.mean(per_bibcode['match_count_sum']).as_py(),
+            'mentions_by_location': dict(location_counts),
+            'top_terms_by_mentions': [
+                {'term_id': term_id, 'term_name': term_name, 0: count}
+                for term_id, term_name, count in zip(top_terms['term_id'].to_pylist(),
+                                                     top_terms['term_name'].to_pylist(),
+                                                     top_terms['term_id_count'].to_pylist())
+            ],
+            'mentions_with_title_presence': pc.sum(table['in_title'].cast(pa.int64())).as_py() or 0,
+            'mentions_with_abstract_presence': pc.sum(table['in_abstract'].cast(pa.int64())).as_py() or 0
         }
         
         # Save as JSON
@@ -100,31 +161,55 @@ class OutputFormatter:
         return stats
     
     def get_data_info(self) -> dict:
-        """Get basic information about the dataset."""
-        if self.df is None:
-            self.load_data()
+        """Get basic information about the dataset from Parquet metadata.
+        
+        Only the term_id and bibcode columns are read (for distinct counts).
+        """
+        parquet_file = pq.ParquetFile(self.parquet_path)
+        metadata = parquet_file.metadata
+        ids = parquet_file.read(columns=['term_id', 'bibcode'])
+        
+        # Uncompressed Parquet size approximates the in-memory footprint when
+        # the DataFrame has not been loaded
+        if self.df is not None:
+            memory_bytes = self.df.memory_usage(deep=True).sum()
+        else:
+            memory_bytes = sum(metadata.row_group(i).total_byte_size 
+                               for i in range(metadata.num_row_groups))
             
         return {
-            'total_records': len(self.df),
-            'unique_terms': self.df['term_id'].nunique(),
-            'unique_bibcodes': self.df['bibcode'].nunique(),
-            'columns': list(self.df.columns),
-            'memory_usage_mb': self.df.memory_usage(deep=True).sum() / 1024 / 1024,
+            'total_records': metadata.num_rows,
+            'unique_terms': pc.count_distinct(_decode(ids['term_id'])).as_py(),
+            'unique_bibcodes': pc.count_distinct(_decode(ids['bibcode'])).as_py(),
+            'columns': parquet_file.schema_arrow.names,
+            'memory_usage_mb': memory_bytes / 1024 / 1024,
             'file_size_mb': self.parquet_path.stat().st_size / 1024 / 1024
         }
 
 
 def export_all_formats(parquet_path: Path, 
                       output_dir: Path,
-                      export_single_csv: bool = True,
+                      export_single_csv: bool = False,
                       export_term_csvs: bool = False,
-                      compression: str = 'gzip'):
-    """Export data in all requested formats."""
+                      compression: str = 'gzip',
+                      export_feather: bool = True,
+                      export_single_parquet: bool = True):
+    """Export data in all requested formats (Parquet and Feather by default, CSV opt-in)."""
     formatter = OutputFormatter(parquet_path)
     output_dir.mkdir(parents=True, exist_ok=True)
     
     exported_paths = {}
     
+    # Export single Parquet file if requested
+    if export_single_parquet:
+        single_parquet_path = output_dir / 'software_mentions_all'
+        exported_paths['single_parquet'] = formatter.export_single_parquet(single_parquet_path)
+    
+    # Export single Feather file if requested
+    if export_feather:
+        feather_path = output_dir / 'software_mentions_all'
+        exported_paths['feather'] = formatter.export_feather(feather_path)
+    
     # Export single CSV if requested
     if export_single_csv:
         csv_path = output_dir / 'software_mentions_all'
@@ -4,22 +4,29 @@
 Quick patch to add the missing pixell mentions to the existing dataset.
 """
 
-import pandas as pd
-import json
+import orjson
+import mmap
 import sqlite3
+from itertools import groupby
+from operator import itemgetter
 from pathlib import Path
-from optimized_extractor.extraction_engine import DocumentProcessor
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from optimized_extractor.extraction_engine import DocumentProcessor, count_substring_matches
 
 def patch_missing_pixell():
     """Add missing pixell mentions to the existing dataset."""
     
-    # Load existing results
-    df = pd.read_csv("optimized_extractor/results/exports/software_mentions_all.csv")
-    print(f"Current dataset: {len(df)} mentions")
+    # Existing results stay on disk; only the row count and term names are read
+    results_path = Path("optimized_extractor/results/software_mentions_extracted.parquet")
+    original_mentions = pq.read_metadata(results_path).num_rows
+    print(f"Current dataset: {original_mentions} mentions")
     
     # Current pixell mentions
-    current_pixell = df[df['term_name'].str.contains('Pixell', case=False, na=False)]
-    print(f"Current pixell mentions: {len(current_pixell)}")
+    term_names = pq.read_table(results_path, columns=['term_name'])['term_name']
+    current_pixell = count_substring_matches(term_names, 'Pixell')
+    print(f"Current pixell mentions: {current_pixell}")
     
     # Missing bibcodes (the ones we identified)
     missing_bibcodes = ['1973MarBi..23..129S', '1990CaJZ...68.1525H', '2004RuJMB..30...28T', 
@@ -36,71 +43,78 @@ def patch_missing_pixell():
     processor = DocumentProcessor(terms_info)
     corpus_base_path = Path('/home/scixmuse/scix_data/ads_metadata_by_year_full/')
     
-    # Get file locations
+    # Get file locations for all bibcodes in one query, ordered for sequential reads
     conn = sqlite3.connect('bibcode_lookup.db')
-    cursor = conn.cursor()
+    placeholders = ','.join('?' * len(missing_bibcodes))
+    rows = conn.execute(
+        f'SELECT bibcode, filename, line_number, byte_offset FROM bibcode_lookup '
+        f'WHERE bibcode IN ({placeholders}) ORDER BY filename, byte_offset',
+        missing_bibcodes
+    ).fetchall()
+    conn.close()
     
     new_records = []
     
-    for bibcode in missing_bibcodes:
-        cursor.execute('SELECT filename, line_number, byte_offset FROM bibcode_lookup WHERE bibcode = ?', (bibcode,))
-        result = cursor.fetchone()
+    # Map each corpus file once and read all of its documents
+    for filename, file_rows in groupby(rows, key=itemgetter(1)):
+        file_path = corpus_base_path / filename
         
-        if result:
-            filename, line_number, byte_offset = result
-            file_path = corpus_base_path / filename
-            
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    f.seek(byte_offset)
-                    line = f.readline()
-                    doc = json.loads(line)
-                
-                # Extract with fixed logic
-                results = processor.process_document(doc, ['2791'])
-                
-                for result in results:
-                    new_records.append({
-                        'term_id': result.term_id,
-                        'term_name': result.term_name,
-                        'bibcode': result.bibcode,
-                        'title': result.title,
-                        'abstract': result.abstract,
-                        'context': result.context,
-                        'match_count': result.match_count,
-                        'in_title': result.in_title,
-                        'in_abstract': result.in_abstract,
-                        'match_location': result.match_location
-                    })
-                    print(f"✅ Added: {bibcode} -> {result.match_location}")
-                    
-            except Exception as e:
-                print(f"❌ Error processing {bibcode}: {e}")
-    
-    conn.close()
+        try:
+            with open(file_path, 'rb') as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for bibcode, _, line_number, byte_offset in file_rows:
+                    try:
+                        end = mm.find(b'\n', byte_offset)
+                        line = mm[byte_offset:end if end != -1 else len(mm)]
+                        doc = orjson.loads(line)
+                        
+                        # Extract with fixed logic
+                        results = processor.process_document(doc, ['2791'])
+                        
+                        for result in results:
+                            new_records.append({
+                                'term_id': result.term_id,
+                                'term_name': result.term_name,
+                                'bibcode': result.bibcode,
+                                'title': result.title,
+                                'abstract': result.abstract,
+                                'context': result.context,
+                                'match_count': result.match_count,
+                                'in_title': result.in_title,
+                                'in_abstract': result.in_abstract,
+                                'match_location': result.match_location
+                            })
+                            print(f"✅ Added: {bibcode} -> {result.match_location}")
+                            
+                    except Exception as e:
+                        print(f"❌ Error processing {bibcode}: {e}")
+                        
+        except Exception as e:
+            print(f"❌ Error opening {filename}: {e}")
     
     if new_records:
-        # Add new records to existing DataFrame
-        new_df = pd.DataFrame(new_records)
-        combined_df = pd.concat([df, new_df], ignore_index=True)
-        
-        # Save updated dataset
+        # Stream the existing rows into the CSV batch by batch, then append the new rows
         output_path = "optimized_extractor/results/exports/software_mentions_all_patched.csv"
-        combined_df.to_csv(output_path, index=False)
+        parquet_file = pq.ParquetFile(results_path)
+        schema = parquet_file.schema_arrow
+        with pa_csv.CSVWriter(output_path, schema) as csv_writer:
+            for batch in parquet_file.iter_batches():
+                csv_writer.write_batch(batch)
+            csv_writer.write_table(pa.Table.from_pylist(new_records, schema=schema))
         
         print(f"\\nPatched dataset saved to: {output_path}")
-        print(f"Original mentions: {len(df)}")
+        print(f"Original mentions: {original_mentions}")
         print(f"Added mentions: {len(new_records)}")
-        print(f"Total mentions: {len(combined_df)}")
+        print(f"Total mentions: {original_mentions + len(new_records)}")
         
         # Verify pixell count
-        patched_pixell = combined_df[combined_df['term_name'].str.contains('Pixell', case=False, na=False)]
-        print(f"Pixell mentions after patch: {len(patched_pixell)}")
+        added_pixell = sum('pixell' in record['term_name'].lower() for record in new_records)
+        print(f"Pixell mentions after patch: {current_pixell + added_pixell}")
         
-        return combined_df
+        return output_path
     else:
         print("No new records to add")
-        return df
+        return None
 
 if __name__ == "__main__":
     patch_missing_pixell()
@@ -1,33 +1,66 @@
 # optimized_extractor/preprocessing.py
 """Preprocessing module for optimized software mention extraction."""
 
-import json
+import orjson
 import re
 import sqlite3
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from pathlib import Path
 from typing import Dict, List, Set, Tuple
 from collections import defaultdict
+from itertools import chain
 import logging
 
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Bibcode segment of an ADS abstract URL, e.g. .../abs/2019ascl.soft05001X/abstract
+_BIBCODE_RE = re.compile(r'abs/([^/?#]+)')
+
+def extract_bibcode_from_url(entry: str) -> str:
+    """Extract bibcode from URL or return as-is if not URL."""
+    if not isinstance(entry, str):
+        return None
+    idx = entry.find('abs/')
+    if idx < 0:
+        return entry
+    match = _BIBCODE_RE.search(entry, idx)
+    return match.group(1) if match else entry
+
+# Ontologies larger than this are streamed term by term with ijson (when
+# installed); smaller ones parse faster in one orjson call
+STREAM_ONTOLOGY_BYTES = 256 * 1024 * 1024
+
+# Ontology fields holding bibcodes or ADS URLs (a list, a single string, or false)
+BIBCODE_FIELDS = ('positive_bibcodes', 'negative_bibcodes', 'used_in', 'described_in', 'cited_in')
+
+def _field_entries(value) -> tuple:
+    """Normalize a bibcode field value to a sequence of entries."""
+    if isinstance(value, list):
+        return value
+    if isinstance(value, str) and value:
+        return (value,)
+    return ()
+
 class BiblioPreprocessor:
     """Handles preprocessing of ASCL ontology and bibcode resolution."""
     
     def __init__(self, ontology_path: Path, bibcode_db_path: Path):
         self.ontology_path = ontology_path
         self.bibcode_db_path = bibcode_db_path
-        self.bibcode_url_pattern = re.compile(r'abs/([^/?#]+)')
+        self.bibcode_url_pattern = _BIBCODE_RE
         
     def extract_bibcode_from_url(self, entry: str) -> str:
         """Extract bibcode from URL or return as-is if not URL."""
-        if isinstance(entry, str) and 'abs/' in entry:
-            match = self.bibcode_url_pattern.search(entry)
-            return match.group(1) if match else entry
-        return entry if isinstance(entry, str) else None
+        return extract_bibcode_from_url(entry)
         
     def parse_ontology(self) -> Tuple[Dict[str, Dict], Dict[str, Set[str]]]:
         """
@@ -39,13 +72,10 @@ class BiblioPreprocessor:
         """
         logger.info(f"Loading ontology from {self.ontology_path}")
         
-        with open(self.ontology_path, 'r', encoding='utf-8') as f:
-            ontology = json.load(f)
-        
         terms_info = {}
         term_bibcodes = defaultdict(set)
         
-        for term_id, term_data in ontology.items():
+        for term_id, term_data in self._iter_ontology():
             # Store term metadata
             terms_info[term_id] = {
                 'name': term_data.get('title', ''),
@@ -54,25 +84,26 @@ class BiblioPreprocessor:
                 'ascl_id': term_data.get('ascl_id', '')
             }
             
-            # Extract bibcodes from all relevant fields
-            bibcode_fields = ['positive_bibcodes', 'negative_bibcodes', 'used_in', 'described_in', 'cited_in']
-            
-            for field in bibcode_fields:
-                entries = term_data.get(field, [])
-                if entries and entries != False:  # Skip false entries
-                    if isinstance(entries, list):
-                        for entry in entries:
-                            bibcode = self.extract_bibcode_from_url(entry)
-                            if bibcode:
-                                term_bibcodes[term_id].add(bibcode)
-                    elif isinstance(entries, str):
-                        bibcode = self.extract_bibcode_from_url(entries)
-                        if bibcode:
-                            term_bibcodes[term_id].add(bibcode)
+            # Extract bibcodes from all relevant fields in one flattened pass
+            entries = chain.from_iterable(
+                _field_entries(term_data.get(field)) for field in BIBCODE_FIELDS
+            )
+            bibcodes = {bibcode for bibcode in map(extract_bibcode_from_url, entries) if bibcode}
+            if bibcodes:
+                term_bibcodes[term_id] = bibcodes
         
         logger.info(f"Parsed {len(terms_info)} terms with {sum(len(v) for v in term_bibcodes.values())} total bibcode associations")
         return terms_info, dict(term_bibcodes)
     
+    def _iter_ontology(self):
+        """Yield (term_id, term_data) pairs from the ontology JSON object."""
+        if ijson is not None and self.ontology_path.stat().st_size > STREAM_ONTOLOGY_BYTES:
+            # Only one term's subtree is in memory at a time
+            with open(self.ontology_path, 'rb') as f:
+                yield from ijson.kvitems(f, '', use_float=True)
+        else:
+            yield from orjson.loads(self.ontology_path.read_bytes()).items()
+    
     def get_unique_bibcodes(self, term_bibcodes: Dict[str, Set[str]]) -> Set[str]:
         """Get deduplicated set of all bibcodes."""
         all_bibcodes = set()
@@ -86,7 +117,8 @@ class BiblioPreprocessor:
         Bulk resolve bibcodes to file locations using single JOIN operation.
         
         Returns:
-            DataFrame with columns: bibcode, filename, line_number, byte_offset, year
+            DataFrame with columns: bibcode, filename, line_number, byte_offset, year,
+            ordered by filename then byte_offset
         """
         logger.info(f"Resolving {len(bibcodes)} bibcodes via bulk database join")
         
@@ -94,21 +126,25 @@ class BiblioPreprocessor:
         conn = sqlite3.connect(self.bibcode_db_path)
         
         try:
+            # Connection-local settings: keep the temp table in RAM with a large
+            # page cache, and skip fsyncs (the lookup DB itself is only read)
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA cache_size=-262144")
+            conn.execute("PRAGMA synchronous=OFF")
+            
             # Create temporary table for bibcodes
             conn.execute("CREATE TEMP TABLE temp_bibcodes (bibcode TEXT PRIMARY KEY)")
             
-            # Insert bibcodes in batches
-            batch_size = 10000
-            bibcode_list = list(bibcodes)
-            for i in range(0, len(bibcode_list), batch_size):
-                batch = bibcode_list[i:i + batch_size]
-                conn.executemany("INSERT INTO temp_bibcodes VALUES (?)", [(b,) for b in batch])
+            # Insert all bibcodes in one transaction with a single executemany
+            with conn:
+                conn.executemany("INSERT INTO temp_bibcodes VALUES (?)", ((b,) for b in bibcodes))
             
-            # Perform bulk join
+            # Perform bulk join, ordered for sequential reads of each file
             query = """
             SELECT t.bibcode, l.filename, l.line_number, l.byte_offset, l.year
             FROM temp_bibcodes t
             JOIN bibcode_lookup l ON t.bibcode = l.bibcode
+            ORDER BY l.filename, l.byte_offset
             """
             
             result_df = pd.read_sql_query(query, conn)
@@ -125,6 +161,9 @@ class BiblioPreprocessor:
         """
         Group resolved bibcodes by filename and create work assignments.
         
+        Rows are expected in (filename, byte_offset) order, as returned by
+        resolve_bibcodes_bulk, so each file's assignments come out sorted.
+        
         Returns:
             {filename: [{'bibcode': str, 'byte_offset': int, 'line_number': int, 
                         'terms': [term_ids that mention this bibcode]}]}
@@ -140,24 +179,26 @@ class BiblioPreprocessor:
         # Group by filename and add term information
         file_assignments = defaultdict(list)
         
-        for _, row in resolved_bibcodes.iterrows():
-            bibcode = row['bibcode']
-            filename = row['filename']
-            
+        # Zip plain Python lists of the columns; far cheaper than a Series per row
+        columns = zip(
+            resolved_bibcodes['bibcode'].tolist(),
+            resolved_bibcodes['filename'].tolist(),
+            resolved_bibcodes['byte_offset'].tolist(),
+            resolved_bibcodes['line_number'].tolist(),
+            resolved_bibcodes['year'].tolist(),
+        )
+        
+        for bibcode, filename, byte_offset, line_number, year in columns:
             assignment = {
                 'bibcode': bibcode,
-                'byte_offset': row['byte_offset'],
-                'line_number': row['line_number'],
-                'year': row['year'],
+                'byte_offset': byte_offset,
+                'line_number': line_number,
+                'year': year,
                 'terms': bibcode_to_terms.get(bibcode, [])
             }
             
             file_assignments[filename].append(assignment)
         
-        # Sort by byte offset for sequential processing
-        for filename in file_assignments:
-            file_assignments[filename].sort(key=lambda x: x['byte_offset'])
-        
         logger.info(f"Created assignments for {len(file_assignments)} files")
         return dict(file_assignments)
     
@@ -169,19 +210,33 @@ class BiblioPreprocessor:
         """Save preprocessing results for the extraction phase."""
         output_dir.mkdir(parents=True, exist_ok=True)
         
+        # Indented for readability; numpy scalars from the resolved DataFrame serialize as-is
+        dump_options = orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        
         # Save terms info
-        with open(output_dir / 'terms_info.json', 'w') as f:
-            json.dump(terms_info, f, indent=2)
+        (output_dir / 'terms_info.json').write_bytes(orjson.dumps(terms_info, option=dump_options))
         
         # Save term-bibcode mappings
         # Convert sets to lists for JSON serialization
         term_bibcodes_serializable = {k: list(v) for k, v in term_bibcodes.items()}
-        with open(output_dir / 'term_bibcodes.json', 'w') as f:
-            json.dump(term_bibcodes_serializable, f, indent=2)
+        (output_dir / 'term_bibcodes.json').write_bytes(
+            orjson.dumps(term_bibcodes_serializable, option=dump_options)
+        )
         
-        # Save file assignments
-        with open(output_dir / 'file_assignments.json', 'w') as f:
-            json.dump(file_assignments, f, indent=2)
+        # Save file assignments as one flat Parquet table, one row per assignment
+        # in file and byte-offset order
+        rows = [(filename, assignment) 
+                for filename, assignments in file_assignments.items() 
+                for assignment in assignments]
+        assignments_table = pa.Table.from_pydict({
+            'filename': [filename for filename, _ in rows],
+            'bibcode': [a['bibcode'] for _, a in rows],
+            'byte_offset': pa.array([a['byte_offset'] for _, a in rows], type=pa.int64()),
+            'line_number': pa.array([a['line_number'] for _, a in rows], type=pa.int64()),
+            'year': [a['year'] for _, a in rows],
+            'terms': pa.array([a['terms'] for _, a in rows], type=pa.list_(pa.string())),
+        })
+        pq.write_table(assignments_table, output_dir / 'file_assignments.parquet', compression='zstd')
         
         logger.info(f"Saved preprocessing results to {output_dir}")
 
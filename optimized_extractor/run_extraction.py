@@ -72,8 +72,8 @@ def parse_arguments():
     parser.add_argument(
         '--export-single-csv',
         action='store_true',
-        default=True,
-        help='Export single compressed CSV file'
+        default=False,
+        help='Also export a single compressed CSV file'
     )
     
     parser.add_argument(
@@ -83,6 +83,18 @@ def parse_arguments():
         help='Export separate CSV files for each term'
     )
     
+    parser.add_argument(
+        '--no-single-parquet',
+        action='store_true',
+        help='Skip the single Parquet (zstd) export'
+    )
+    
+    parser.add_argument(
+        '--no-feather',
+        action='store_true',
+        help='Skip the single Feather (zstd) export'
+    )
+    
     parser.add_argument(
         '--compression',
         choices=['gzip', 'bz2', 'xz', None],
@@ -98,6 +110,13 @@ def parse_arguments():
         help='Number of parallel workers (default: CPU count)'
     )
     
+    parser.add_argument(
+        '--executor',
+        choices=['process', 'thread'],
+        default='process',
+        help='Run workers as processes, or as threads sharing one matcher'
+    )
+    
     parser.add_argument(
         '--skip-preprocessing',
         action='store_true',
@@ -197,7 +216,7 @@ def run_extraction(args, preprocessed_dir):
     start_time = time.time()
     
     # Initialize extraction engine
-    engine = ExtractionEngine(args.corpus_path, args.num_workers)
+    engine = ExtractionEngine(args.corpus_path, args.num_workers, args.executor)
     
     # Run extraction
     result_path = engine.run_extraction(preprocessed_dir, args.output_dir)
@@ -224,7 +243,9 @@ def run_output_formatting(args, parquet_path):
         output_dir=export_dir,
         export_single_csv=args.export_single_csv,
         export_term_csvs=args.export_term_csvs,
-        compression=args.compression
+        compression=args.compression,
+        export_feather=not args.no_feather,
+        export_single_parquet=not args.no_single_parquet
     )
     
     elapsed = time.time() - start_time
@@ -278,6 +299,10 @@ def main():
         logger.info(f"Dataset info: {info}")
         logger.info(f"Main result file: {parquet_path}")
         
+        if exported_paths.get('single_parquet'):
+            logger.info(f"Single Parquet export: {exported_paths['single_parquet']}")
+        if exported_paths.get('feather'):
+            logger.info(f"Feather export: {exported_paths['feather']}")
         if exported_paths.get('single_csv'):
             logger.info(f"Single CSV export: {exported_paths['single_csv']}")
         if exported_paths.get('term_csvs'):
@@ -6,51 +6,74 @@ Allows searching for specific terms and viewing all associated metadata.
 """
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
 import sys
+import textwrap
 from pathlib import Path
 
+# Columns used by the search and display; nothing else is read from Parquet
+SEARCH_COLUMNS = ['term_name', 'bibcode', 'match_location', 'match_count',
+                  'in_title', 'in_abstract', 'title', 'context']
+
 def load_data():
-    """Load the extracted software mentions data."""
-    # Check for individual contexts version first, then patched, then original
+    """Load the extracted software mentions data as an Arrow table."""
+    # Check for individual contexts version first, then patched, then the extraction Parquet
     individual_path = Path("results/exports/software_mentions_all_individual_contexts.csv")
     patched_path = Path("results/exports/software_mentions_all_patched.csv")
-    csv_path = Path("results/exports/software_mentions_all.csv")
+    data_path = Path("results/software_mentions_extracted.parquet")
     
     if individual_path.exists():
-        csv_path = individual_path
+        data_path = individual_path
         print("Using new dataset with individual match contexts")
     elif patched_path.exists():
-        csv_path = patched_path
+        data_path = patched_path
         print("Using patched dataset with fixed title/abstract extractions")
     
-    if not csv_path.exists():
-        print(f"❌ Error: CSV file not found at {csv_path}")
+    if not data_path.exists():
+        print(f"❌ Error: results file not found at {data_path}")
         print("Please make sure you've run the extraction pipeline first.")
         sys.exit(1)
     
     print("Loading software mentions data...")
     try:
-        df = pd.read_csv(csv_path)
-        print(f"✅ Loaded {len(df):,} software mentions")
-        return df
+        if data_path.suffix == '.parquet':
+            table = pq.read_table(data_path, columns=SEARCH_COLUMNS)
+            # Dictionary-encoded columns become plain strings for the string kernels
+            table = table.cast(pa.schema([
+                pa.field(field.name, field.type.value_type) if pa.types.is_dictionary(field.type) else field
+                for field in table.schema
+            ]))
+        else:
+            table = pa_csv.read_csv(data_path)
+        print(f"✅ Loaded {table.num_rows:,} software mentions")
+        return table
     except Exception as e:
-        print(f"❌ Error loading CSV: {e}")
+        print(f"❌ Error loading data: {e}")
         sys.exit(1)
 
-def search_term(df, search_query):
-    """Search for a specific term in the data."""
+def search_term(table, search_query):
+    """Search for a specific term in the data.
+    
+    Matching runs on the Arrow table; only the matching rows are converted
+    to a DataFrame for display.
+    """
     # Search by term name (case-insensitive)
-    results = df[df['term_name'].str.contains(search_query, case=False, na=False)]
+    term_names = table['term_name']
+    mask = pc.fill_null(pc.match_substring(term_names, search_query, ignore_case=True), False)
     
-    if len(results) == 0:
+    if not pc.any(mask).as_py():
         # Also search by extracted software name (before colon)
-        df_copy = df.copy()
-        df_copy['software_name'] = df_copy['term_name'].apply(
-            lambda x: x.split(':')[0].strip() if ':' in str(x) else str(x)
+        # Names without a colon already failed the full-name match above, so the
+        # trimmed prefix can be matched directly with no per-row selection
+        software_names = pc.utf8_trim_whitespace(
+            pc.list_element(pc.split_pattern(term_names, ':', max_splits=1), 0)
         )
-        results = df_copy[df_copy['software_name'].str.contains(search_query, case=False, na=False)]
+        mask = pc.fill_null(pc.match_substring(software_names, search_query, ignore_case=True), False)
     
-    return results
+    return table.filter(mask).to_pandas(types_mapper=pd.ArrowDtype)
 
 def display_results(results, search_query):
     """Display search results in a formatted way."""
@@ -84,25 +107,25 @@ def display_results(results, search_query):
         print(f"\n📋 DETAILED MENTIONS:")
         print("-" * 60)
         
-        # Show each mention
-        for idx, (_, row) in enumerate(group.iterrows(), 1):
-            print(f"\n{idx}. 📄 {row['bibcode']} ({row['match_location']})")
+        # Show each mention; itertuples yields plain namedtuples instead of boxing a Series per row
+        for idx, row in enumerate(group.itertuples(index=False), 1):
+            print(f"\n{idx}. 📄 {row.bibcode} ({row.match_location})")
             
             # Show title if available
-            if pd.notna(row['title']) and row['title'].strip():
-                title = str(row['title']).strip()[:100]
-                print(f"   📝 Title: {title}{'...' if len(str(row['title'])) > 100 else ''}")
+            if pd.notna(row.title) and row.title.strip():
+                title = str(row.title).strip()[:100]
+                print(f"   📝 Title: {title}{'...' if len(str(row.title)) > 100 else ''}")
             
             # Show match details
-            print(f"   🎯 Matches in text: {row['match_count']}")
+            print(f"   🎯 Matches in text: {row.match_count}")
             
-            if row['in_title']:
+            if row.in_title:
                 print(f"   ✅ Also found in title")
-            if row['in_abstract']:
+            if row.in_abstract:
                 print(f"   ✅ Also found in abstract")
             
             # Show context
-            context = str(row['context']).strip()
+            context = str(row.context).strip()
             if context and context != 'nan':
                 print(f"   📖 Context:")
                 # Highlight the search term in context (case-insensitive)
@@ -117,30 +140,13 @@ def display_results(results, search_query):
                     )
                 
                 # Wrap long context
-                max_width = 70
-                words = highlighted_context.split()
-                lines = []
-                current_line = []
-                current_length = 0
-                
-                for word in words:
-                    if current_length + len(word) + 1 > max_width and current_line:
-                        lines.append(' '.join(current_line))
-                        current_line = [word]
-                        current_length = len(word)
-                    else:
-                        current_line.append(word)
-                        current_length += len(word) + 1
-                
-                if current_line:
-                    lines.append(' '.join(current_line))
-                
-                for line in lines:
+                for line in textwrap.wrap(highlighted_context, width=70,
+                                          break_long_words=False, break_on_hyphens=False):
                     print(f"      {line}")
             
             print()
 
-def interactive_search(df):
+def interactive_search(table):
     """Interactive search loop."""
     print("\n🔍 INTERACTIVE SOFTWARE MENTION SEARCH")
     print("=" * 50)
@@ -160,7 +166,7 @@ def interactive_search(df):
                 print("Please enter a search term.")
                 continue
             
-            results = search_term(df, query)
+            results = search_term(table, query)
             display_results(results, query)
             
             print("\n" + "─" * 80)
@@ -177,17 +183,17 @@ def main():
     print("=" * 50)
     
     # Load data
-    df = load_data()
+    table = load_data()
     
     # Check if command line argument provided
     if len(sys.argv) > 1:
         search_query = ' '.join(sys.argv[1:])
         print(f"\nSearching for: '{search_query}'")
-        results = search_term(df, search_query)
+        results = search_term(table, search_query)
         display_results(results, search_query)
     else:
         # Interactive mode
-        interactive_search(df)
+        interactive_search(table)
 
 if __name__ == "__main__":
     main()
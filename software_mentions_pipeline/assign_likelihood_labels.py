@@ -1,11 +1,27 @@
 # software_mention_pipeline/assign_likelihood_labels.py
-import json
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.json as pa_json
+import pyarrow.parquet as pq
 from pathlib import Path
-from tqdm import tqdm
 
 INPUT_PATH = Path("data/scored_contexts.jsonl")
-OUTPUT_CONTEXTS_PATH = Path("data/labeled_contexts.jsonl")
-OUTPUT_SUMMARY_PATH = Path("data/labeled_entities.jsonl")
+OUTPUT_CONTEXTS_PATH = Path("data/labeled_contexts.parquet")
+OUTPUT_SUMMARY_PATH = Path("data/labeled_entities.parquet")
+# Input is parsed in blocks of this size, spread across all cores
+READ_BLOCK_BYTES = 16 << 20
+
+# Record layout written by score_filtered_contexts.py, used when it produced no records
+SCORED_CONTEXTS_SCHEMA = pa.schema([
+    ("bibcode", pa.string()),
+    ("label", pa.string()),
+    ("heuristic_keywords", pa.list_(pa.string())),
+    ("ner_tag_oeg", pa.bool_()),
+    ("ner_tag_ibm", pa.bool_()),
+    ("ner_tag_any", pa.bool_()),
+    ("embedding_similarity", pa.float64()),
+])
 
 # Thresholds for scoring
 THRESHOLDS = {
@@ -14,44 +30,65 @@ THRESHOLDS = {
     "very likely": 1.0
 }
 
+# Output labels, indexed by the int8 codes determine_likelihoods returns
+LIKELIHOOD_LABELS = ["unlikely", "somewhat likely", "very likely"]
+
+
+def _truthy(table, name):
+    """Boolean mask of rows where the field is present and truthy, like `if value:`."""
+    if name not in table.column_names:
+        return np.zeros(table.num_rows, dtype=bool)
+    column = table[name]
+    if pa.types.is_boolean(column.type):
+        mask = column
+    elif pa.types.is_list(column.type):
+        mask = pc.greater(pc.list_value_length(column), 0)
+    elif pa.types.is_string(column.type):
+        mask = pc.greater(pc.utf8_length(column), 0)
+    elif pa.types.is_null(column.type):
+        return np.zeros(table.num_rows, dtype=bool)
+    else:
+        mask = pc.not_equal(column, 0)
+    return pc.fill_null(mask, False).to_numpy(zero_copy_only=False)
 
-def determine_likelihood(similarity, ner_tag, heuristic_keywords):
-    if similarity is None:
-        return "unlikely"
 
-    if similarity >= THRESHOLDS["somewhat likely"] and (ner_tag or heuristic_keywords):
-        return "very likely"
-    elif similarity >= THRESHOLDS["unlikely"]:
-        return "somewhat likely"
+def determine_likelihoods(table):
+    """Likelihood code (index into LIKELIHOOD_LABELS) for every record, computed over whole columns at once."""
+    if "embedding_similarity" in table.column_names:
+        # Missing similarities come through as NaN and fail every threshold
+        similarity = pc.cast(table["embedding_similarity"], pa.float64()).to_numpy(zero_copy_only=False)
     else:
-        return "unlikely"
+        similarity = np.full(table.num_rows, np.nan)
+    has_signal = _truthy(table, "ner_tag_any") | _truthy(table, "heuristic_keywords")
+
+    return np.select(
+        [(similarity >= THRESHOLDS["somewhat likely"]) & has_signal,
+         similarity >= THRESHOLDS["unlikely"]],
+        [np.int8(2), np.int8(1)],
+        default=np.int8(0)
+    ).astype(np.int8)
+
+
+def read_scored_contexts(path):
+    """Scored context records as an Arrow table; an empty file gives an empty table."""
+    # Arrow's JSON reader rejects empty input, which is a legitimate result when no label passed
+    if path.stat().st_size == 0:
+        return SCORED_CONTEXTS_SCHEMA.empty_table()
+    # Arrow's JSON reader splits the file on newlines into blocks, parses them on
+    # a thread pool without holding the GIL, and reassembles them in order
+    read_options = pa_json.ReadOptions(use_threads=True, block_size=READ_BLOCK_BYTES)
+    return pa_json.read_json(path, read_options=read_options)
 
 
 def assign_labels():
-    with open(INPUT_PATH, "r", encoding="utf-8") as f_in, \
-         open(OUTPUT_CONTEXTS_PATH, "w", encoding="utf-8") as f_out_context, \
-         open(OUTPUT_SUMMARY_PATH, "w", encoding="utf-8") as f_out_summary:
-
-        for line in tqdm(f_in, desc="📋 Assigning likelihood labels"):
-            record = json.loads(line)
-            sim = record.get("embedding_similarity")
-            ner = record.get("ner_tag")
-            heuristics = record.get("heuristic_keywords", [])
-
-            likelihood = determine_likelihood(sim, ner, heuristics)
-            record["likelihood"] = likelihood
-
-            # Write enriched context record
-            json.dump(record, f_out_context)
-            f_out_context.write("\n")
-
-            # Write summary record for deduped ID matching
-            json.dump({
-                "bibcode": record["bibcode"],
-                "label": record["label"],
-                "likelihood": likelihood
-            }, f_out_summary)
-            f_out_summary.write("\n")
+    table = read_scored_contexts(INPUT_PATH)
+    # Codes become a dictionary column directly; no per-row label strings are built
+    likelihood = pa.DictionaryArray.from_arrays(determine_likelihoods(table), LIKELIHOOD_LABELS)
+    table = table.append_column("likelihood", likelihood)
+
+    # Full context records with their labels, and the (bibcode, label) summary
+    pq.write_table(table, OUTPUT_CONTEXTS_PATH, compression="zstd")
+    pq.write_table(table.select(["bibcode", "label", "likelihood"]), OUTPUT_SUMMARY_PATH, compression="zstd")
 
     print(f"✅ Likelihood assignment complete. Saved to {OUTPUT_CONTEXTS_PATH} and {OUTPUT_SUMMARY_PATH}")
 
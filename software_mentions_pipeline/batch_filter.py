@@ -1,42 +1,126 @@
 # software_mention_pipeline/batch_filter.py
-import json
+import mmap
+import multiprocessing as mp
+import os
 from pathlib import Path
 from tqdm import tqdm
-import re
+import numpy as np
+import orjson
+from label_matcher import label_entries, build_automaton, build_database, iter_label_hits, is_exact_hit
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
 
 CORPUS_PATH = Path("data/corpus.jsonl")
 LABELS_PATH = Path("data/filtered_labels.json")
 OUTPUT_PATH = Path("data/matched_bibcodes.jsonl")
+CHUNK_BYTES = 64 << 20
 
 
 def load_labels():
-    with open(LABELS_PATH, "r", encoding="utf-8") as f:
-        return set(json.load(f))
-
-
-def load_corpus():
-    with open(CORPUS_PATH, "r", encoding="utf-8") as f:
-        for line in f:
+    return set(orjson.loads(LABELS_PATH.read_bytes()))
+
+
+def split_ranges(path, chunk_bytes):
+    """Split a JSONL file into (start, end) byte ranges that end on line boundaries."""
+    size = os.path.getsize(path)
+    ranges = []
+    with open(path, "rb") as f:
+        start = 0
+        while start < size:
+            f.seek(min(start + chunk_bytes, size))
+            f.readline()
+            end = f.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+# Bytes that count as \w in ASCII text
+_ASCII_WORD_BYTES = np.zeros(256, dtype=np.bool_)
+for _ch in b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_":
+    _ASCII_WORD_BYTES[_ch] = True
+
+if njit is not None:
+    @njit(cache=True)
+    def _confirm_ascii_hits(text, starts, ends, is_phrase, is_word):
+        """Compiled is_exact_hit over every hit of one ASCII document at once."""
+        n = text.shape[0]
+        keep = np.zeros(starts.shape[0], dtype=np.bool_)
+        for k in range(starts.shape[0]):
+            start = starts[k]
+            end = ends[k]
+            if is_phrase[k]:
+                left = start > 0 and is_word[text[start - 1]]
+                right = end < n and is_word[text[end]]
+            else:
+                # Look past hyphens: a word character beyond them continues the token
+                i = start - 1
+                while i >= 0 and text[i] == 45:
+                    i -= 1
+                left = i >= 0 and is_word[text[i]]
+                j = end
+                while j < n and text[j] == 45:
+                    j += 1
+                right = j < n and is_word[text[j]]
+            keep[k] = not (left or right)
+        return keep
+else:
+    _confirm_ascii_hits = None
+
+
+def confirmed_labels(full_text, hits):
+    """Labels of the (start, end, label, is_phrase) hits that pass is_exact_hit."""
+    if _confirm_ascii_hits is not None and hits and full_text.isascii():
+        starts, ends, labels, phrases = zip(*hits)
+        keep = _confirm_ascii_hits(
+            np.frombuffer(full_text.encode("ascii"), dtype=np.uint8),
+            np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64),
+            np.array(phrases, dtype=np.bool_), _ASCII_WORD_BYTES
+        )
+        return {label for label, ok in zip(labels, keep) if ok}
+
+    found_labels = set()
+    for start, end, label, is_phrase in hits:
+        if label not in found_labels and is_exact_hit(full_text, start, end, is_phrase):
+            found_labels.add(label)
+    return found_labels
+
+
+# Per-process matcher state, filled by init_worker
+_WORKER_STATE = {}
+
+
+def init_worker(label_set):
+    """Build the label matchers once per worker process."""
+    entries = label_entries(label_set)
+    _WORKER_STATE["entries"] = entries
+    _WORKER_STATE["automaton"] = build_automaton(entries)
+    _WORKER_STATE["database"] = build_database(entries)
+
+
+def scan_range(byte_range):
+    """Match every document in one byte range; returns (bytes scanned, JSONL output)."""
+    entries = _WORKER_STATE["entries"]
+    automaton = _WORKER_STATE["automaton"]
+    database = _WORKER_STATE["database"]
+
+    range_start, range_end = byte_range
+    output = []
+    with open(CORPUS_PATH, "rb") as f, \
+         mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        mm.seek(range_start)
+        while mm.tell() < range_end:
+            line = mm.readline()
+            if not line:
+                break
             try:
-                yield json.loads(line)
-            except json.JSONDecodeError:
+                doc = orjson.loads(line)
+            except ValueError:
                 continue
 
-
-def count_lines(path):
-    with open(path, "r", encoding="utf-8") as f:
-        return sum(1 for _ in f)
-
-
-def exact_match_pass(label_set):
-    total_lines = count_lines(CORPUS_PATH)
-
-    # Separate single-word and phrase labels
-    token_labels = {label for label in label_set if " " not in label}
-    phrase_labels = {label for label in label_set if " " in label}
-
-    with open(OUTPUT_PATH, "w", encoding="utf-8") as outf:
-        for doc in tqdm(load_corpus(), total=total_lines, desc="🔍 Strict exact matches"):
             title = " ".join(doc.get("title", [])) if isinstance(doc.get("title", []), list) else doc.get("title", "")
             abstract = doc.get("abstract", "")
             body = doc.get("body", "")
@@ -45,23 +129,33 @@ def exact_match_pass(label_set):
                 continue
 
             full_text = f"{title} {abstract} {body}"
-            tokens = set(re.findall(r"\b[\w\-]+\b", full_text))
 
-            found_labels = set()
-            for label in token_labels:
-                if label in tokens:
-                    found_labels.add(label)
-            for label in phrase_labels:
-                if re.search(rf"(?<!\w){re.escape(label)}(?!\w)", full_text):
-                    found_labels.add(label)
+            # Scan each document once for every label instead of looping over labels
+            hits = list(iter_label_hits(full_text, entries, automaton, database))
+            found_labels = confirmed_labels(full_text, hits)
 
             for label in found_labels:
-                json.dump({
+                output.append(orjson.dumps({
                     "bibcode": bibcode,
                     "title": title,
                     "label": label
-                }, outf)
-                outf.write("\n")
+                }, option=orjson.OPT_APPEND_NEWLINE))
+
+    return range_end - range_start, b"".join(output)
+
+
+def exact_match_pass(label_set, num_workers=None):
+    # Documents are independent, so byte ranges of the corpus are scanned in parallel
+    ranges = split_ranges(CORPUS_PATH, CHUNK_BYTES)
+    num_workers = num_workers or mp.cpu_count()
+
+    with mp.Pool(num_workers, initializer=init_worker, initargs=(label_set,)) as pool, \
+         open(OUTPUT_PATH, "wb") as outf, \
+         tqdm(total=os.path.getsize(CORPUS_PATH), unit="B", unit_scale=True,
+              desc="🔍 Strict exact matches") as pbar:
+        for scanned, matches in pool.imap_unordered(scan_range, ranges, chunksize=1):
+            outf.write(matches)
+            pbar.update(scanned)
 
 
 if __name__ == "__main__":
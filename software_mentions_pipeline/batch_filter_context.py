@@ -1,57 +1,86 @@
 # software_mention_pipeline/batch_filter_context.py
-import json
+import mmap
+import os
+from collections import defaultdict
 from pathlib import Path
 from tqdm import tqdm
 import re
+import orjson
+import pyarrow as pa
+import pyarrow.parquet as pq
+from label_matcher import label_entries, build_automaton, build_database, iter_label_hits, is_exact_hit
 
 CORPUS_PATH = Path("data/corpus.jsonl")
 LABELS_PATH = Path("data/filtered_labels.json")
-OUTPUT_PATH = Path("data/contextual_matches.jsonl")
+OUTPUT_PATH = Path("data/contextual_matches.parquet")
 WINDOW_WORDS = 100
+WRITE_BATCH_ROWS = 10_000
 
+OUTPUT_SCHEMA = pa.schema([
+    ("bibcode", pa.string()),
+    ("title", pa.string()),
+    ("abstract", pa.string()),
+    ("labels", pa.list_(pa.string())),
+    ("contexts", pa.list_(pa.string())),
+])
 
-def load_labels():
-    with open(LABELS_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
+# Word/non-word runs for context windows
+_WORD_RUN_RE = re.compile(r"\w+|\W+")
 
 
-def load_corpus():
-    with open(CORPUS_PATH, "r", encoding="utf-8") as f:
-        for line in f:
+def load_labels():
+    return orjson.loads(LABELS_PATH.read_bytes())
+
+
+def load_corpus(pbar=None):
+    """Yield documents from a read-only mapping of the corpus, advancing pbar by bytes read."""
+    if os.path.getsize(CORPUS_PATH) == 0:
+        return
+    with open(CORPUS_PATH, "rb") as f, \
+         mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for line in iter(mm.readline, b""):
+            if pbar is not None:
+                pbar.update(len(line))
             try:
-                yield json.loads(line)
-            except json.JSONDecodeError:
+                yield orjson.loads(line)
+            except ValueError:
                 continue
 
 
-def count_lines(path):
-    with open(path, "r", encoding="utf-8") as f:
-        return sum(1 for _ in f)
+def index_words(text):
+    """Split text into word and non-word runs once, mapping each lowered run to its indices."""
+    words = _WORD_RUN_RE.findall(text)
+    word_positions = defaultdict(list)
+    for i, word in enumerate(words):
+        word_positions[word.lower()].append(i)
+    return words, word_positions
 
 
-def extract_context(text, label):
-    words = re.findall(r"\w+|\W+", text)
-    lowered_words = [w.lower() for w in words]
-    label_lower = label.lower()
-    match_indices = [i for i, word in enumerate(lowered_words) if word == label_lower]
+def extract_context(words, word_positions, label_lower, window_words=WINDOW_WORDS):
     contexts = []
-    for i in match_indices:
-        start = max(0, i - WINDOW_WORDS)
-        end = min(len(words), i + WINDOW_WORDS + 1)
+    for i in word_positions.get(label_lower, ()):
+        start = max(0, i - window_words)
+        end = min(len(words), i + window_words + 1)
         context = ''.join(words[start:end]).replace("\n", " ")
         contexts.append(context.strip())
     return contexts
 
 
 def contextual_exact_match_pass(label_list):
-    total_lines = count_lines(CORPUS_PATH)
-
-    # Separate single-word and phrase labels
-    token_labels = {label for label in label_list if " " not in label}
-    phrase_labels = {label for label in label_list if " " in label}
-
-    with open(OUTPUT_PATH, "w", encoding="utf-8") as outf:
-        for doc in tqdm(load_corpus(), total=total_lines, desc="🧠 Extracting contextual matches"):
+    # Scan each document once for every label instead of looping over labels
+    entries = label_entries(label_list)
+    automaton = build_automaton(entries)
+    database = build_database(entries)
+    # Context lookup keys, lowercased once rather than per hit
+    lowered_labels = {label: label.lower() for label, _ in entries}
+
+    # Progress is tracked in bytes, so the corpus is not read an extra time to count lines
+    # Matches are buffered as columns and written out as zstd Parquet row groups
+    columns = {name: [] for name in OUTPUT_SCHEMA.names}
+    with pq.ParquetWriter(OUTPUT_PATH, OUTPUT_SCHEMA, compression="zstd", compression_level=3) as writer, \
+         tqdm(total=os.path.getsize(CORPUS_PATH), unit="B", unit_scale=True,
+              desc="🧠 Extracting contextual matches") as pbar:
+        for doc in load_corpus(pbar):
             title = " ".join(doc.get("title", [])) if isinstance(doc.get("title", []), list) else doc.get("title", "")
             abstract = doc.get("abstract", "")
             body = doc.get("body", "")
@@ -60,30 +89,34 @@ def contextual_exact_match_pass(label_list):
                 continue
 
             full_text = f"{title} {abstract} {body}"
-            tokens = set(re.findall(r"\b[\w\-]+\b", full_text))
 
             found_labels = []
             found_contexts = []
+            words = word_positions = None
 
-            for label in token_labels:
-                if label in tokens:
-                    found_labels.append(label)
-                    found_contexts.extend(extract_context(full_text, label))
-
-            for label in phrase_labels:
-                if re.search(rf"(?<!\w){re.escape(label)}(?!\w)", full_text):
+            for start, end, label, is_phrase in iter_label_hits(full_text, entries, automaton, database):
+                if label in found_labels:
+                    continue
+                if is_exact_hit(full_text, start, end, is_phrase):
                     found_labels.append(label)
-                    found_contexts.extend(extract_context(full_text, label))
+                    # Tokenize once per document, and only when something matched
+                    if words is None:
+                        words, word_positions = index_words(full_text)
+                    found_contexts.extend(extract_context(words, word_positions, lowered_labels[label]))
 
             if found_labels:
-                json.dump({
-                    "bibcode": bibcode,
-                    "title": title,
-                    "abstract": abstract,
-                    "labels": found_labels,
-                    "contexts": found_contexts
-                }, outf)
-                outf.write("\n")
+                columns["bibcode"].append(bibcode)
+                columns["title"].append(title)
+                columns["abstract"].append(abstract)
+                columns["labels"].append(found_labels)
+                columns["contexts"].append(found_contexts)
+
+                if len(columns["bibcode"]) >= WRITE_BATCH_ROWS:
+                    writer.write_table(pa.table(columns, schema=OUTPUT_SCHEMA))
+                    columns = {name: [] for name in OUTPUT_SCHEMA.names}
+
+        if columns["bibcode"]:
+            writer.write_table(pa.table(columns, schema=OUTPUT_SCHEMA))
 
 
 if __name__ == "__main__":
@@ -1,21 +1,25 @@
 # software_mention_pipeline/debug_score_subset.py
 
-import json
+import orjson
+from itertools import islice
 from pathlib import Path
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 from nltk.tokenize import sent_tokenize
 from transformers import pipeline
 import torch
+from torch_setup import configure_threads
 
-SOFTWARE_EMBEDDINGS_PATH = Path("data/software_embeddings.json")
-CONTEXT_EMBEDDINGS_PATH = Path("data/context_embeddings.json")
+SOFTWARE_EMBEDDINGS_PATH = Path("data/software_embeddings.jsonl")
+CONTEXT_EMBEDDINGS_PATH = Path("data/context_embeddings.jsonl")
 FILTERED_LABELS_PATH = Path("data/filtered_labels.json")
 MAX_ENTRIES = 10
+NER_BATCH_SIZE = 32
 
 RECOGNIZED_SOFTWARE_TAGS = {"SOFTWARE", "TOOL", "Application_Mention"}
 SOFTWARE_KEYWORDS = {"software", "model", "algorithm", "code", "we used", "we ran", "tool", "implementation"}
 
+configure_threads()
+
 ner_pipe = pipeline(
     "ner",
     model="oeg/software_benchmark_multidomain",
@@ -24,39 +28,79 @@ ner_pipe = pipeline(
     device=0 if torch.cuda.is_available() else -1
 )
 
-def run_ner_on_text(text, label):
+def run_ner_batch(items):
+    """NER tag match for each (text, label) pair.
+
+    Every sentence that mentions its label goes to the pipeline in one batched call.
+    """
+    tags = [False] * len(items)
     try:
-        sentences = sent_tokenize(text)
-        relevant = [s for s in sentences if label.lower() in s.lower()]
-        for sent in relevant:
-            ner_results = ner_pipe(sent[:512])
-            for ent in ner_results:
-                if ent["entity_group"] in RECOGNIZED_SOFTWARE_TAGS:
-                    return True
-        return False
+        jobs = [
+            (i, sent[:512])
+            for i, (text, label) in enumerate(items)
+            for sent in sent_tokenize(text)
+            if label.lower() in sent.lower()
+        ]
+        if not jobs:
+            return tags
+        results = ner_pipe([sent for _, sent in jobs], batch_size=NER_BATCH_SIZE)
+        for (i, _), ner_results in zip(jobs, results):
+            if any(ent["entity_group"] in RECOGNIZED_SOFTWARE_TAGS for ent in ner_results):
+                tags[i] = True
     except Exception as e:
         print(f"❌ NER error: {e}")
-        return False
+    return tags
 
-def compute_similarity(vec1, vec2):
-    return float(cosine_similarity([vec1], [vec2])[0][0])
+def normalize_rows(matrix):
+    """float32 copy of matrix with unit-length rows; zero rows stay zero, as in cosine_similarity."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
 
-def load_jsonl(path):
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+def compute_similarities(context_vecs, software_vecs):
+    """Row-wise cosine similarity of two stacks of unit vectors, in one pass."""
+    return np.einsum("ij,ij->i", context_vecs, software_vecs)
+
+def iter_jsonl(path):
+    with open(path, "rb") as f:
+        for line in f:
+            yield orjson.loads(line)
 
 def main():
-    software_embeddings = load_jsonl(SOFTWARE_EMBEDDINGS_PATH)
-    software_dict = {entry["label"].lower(): np.array(entry["embedding"]) for entry in software_embeddings}
+    # Vectors live in the .npy files next to each JSONL, one row per entry
+    software_embeddings = list(iter_jsonl(SOFTWARE_EMBEDDINGS_PATH))
+    # One normalized float32 matrix plus a label -> row index; later rows win for repeated labels
+    software_norm = normalize_rows(np.load(SOFTWARE_EMBEDDINGS_PATH.with_suffix(".npy"), mmap_mode="r"))
+    label_to_row = {entry["label"].lower(): i for i, entry in enumerate(software_embeddings)}
 
-    context_entries = load_jsonl(CONTEXT_EMBEDDINGS_PATH)[:MAX_ENTRIES]
+    # Only the inspected entries are parsed
+    context_entries = list(islice(iter_jsonl(CONTEXT_EMBEDDINGS_PATH), MAX_ENTRIES))
+    context_matrix = np.load(CONTEXT_EMBEDDINGS_PATH.with_suffix(".npy"), mmap_mode="r")
+    for entry, embedding in zip(context_entries, context_matrix):
+        entry["embedding"] = embedding
 
-    with open(FILTERED_LABELS_PATH, "r", encoding="utf-8") as f:
-        valid_labels = set(label.lower() for label in json.load(f))
+    valid_labels = set(label.lower() for label in orjson.loads(FILTERED_LABELS_PATH.read_bytes()))
 
-    print(f"\n📦 Loaded {len(software_dict)} software embeddings and {len(context_entries)} context entries.")
+    print(f"\n📦 Loaded {len(label_to_row)} software embeddings and {len(context_entries)} context entries.")
     print(f"\n🔍 Inspecting first {MAX_ENTRIES} entries...\n")
 
+    # Similarities for every scorable entry are computed up front in one call
+    scorable = [
+        i for i, entry in enumerate(context_entries)
+        if entry["label"].lower() in valid_labels and "embedding" in entry
+        and entry["label"].lower() in label_to_row
+    ]
+    sim_scores = {}
+    if scorable:
+        context_vecs = normalize_rows(np.stack([context_entries[i]["embedding"] for i in scorable]))
+        software_vecs = software_norm[[label_to_row[context_entries[i]["label"].lower()] for i in scorable]]
+        sim_scores = dict(zip(scorable, compute_similarities(context_vecs, software_vecs).tolist()))
+
+    # Likewise NER runs once over the relevant sentences of all scorable entries
+    ner_tags = dict(zip(scorable, run_ner_batch(
+        [(context_entries[i]["text"], context_entries[i]["label"]) for i in scorable]
+    )))
+
     for i, entry in enumerate(context_entries):
         label = entry["label"].lower()
         text = entry["text"]
@@ -72,13 +116,14 @@ def main():
             print(f"   ❌ Context embedding missing.")
             continue
 
-        if label not in software_dict:
+        if label not in label_to_row:
             print(f"   ❌ No software embedding found for label.")
             continue
 
-        sim_score = compute_similarity(software_dict[label], np.array(entry["embedding"]))
-        ner_tag = run_ner_on_text(text, label)
-        keywords = sorted([kw for kw in SOFTWARE_KEYWORDS if kw in text.lower()])
+        sim_score = sim_scores[i]
+        ner_tag = ner_tags[i]
+        lowered = text.lower()
+        keywords = sorted(kw for kw in SOFTWARE_KEYWORDS if kw in lowered)
 
         print(f"   🔑 Keywords found: {keywords}")
         print(f"   🧠 NER tag match: {ner_tag}")
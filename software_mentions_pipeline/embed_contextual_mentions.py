@@ -1,22 +1,21 @@
 # software_mention_pipeline/embed_contextual_mentions.py
 
-import json
+import numpy as np
+import orjson
+import pyarrow.parquet as pq
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
+from embedding_model import model, MODEL_NAME, ENCODE_CHUNK_SIZE, encode_devices, encode_texts
 from tqdm import tqdm
 
-CONTEXTS_PATH = Path("data/contextual_matches.jsonl")
-OUTPUT_PATH = Path("data/context_embeddings.json")
-MODEL_NAME = "nasa-impact/nasa-smd-ibm-st-v2"
-
-model = SentenceTransformer(MODEL_NAME)
+CONTEXTS_PATH = Path("data/contextual_matches.parquet")
+# Metadata (bibcode, label, text) as JSONL; the vectors go to the matching .npy
+OUTPUT_PATH = Path("data/context_embeddings.jsonl")
 
 
 def load_contextual_entries():
     entries = []
-    with open(CONTEXTS_PATH, "r", encoding="utf-8") as f:
-        for line in f:
-            doc = json.loads(line)
+    for batch in pq.ParquetFile(CONTEXTS_PATH).iter_batches():
+        for doc in batch.to_pylist():
             bibcode = doc.get("bibcode")
             title = doc.get("title", "")
             abstract = doc.get("abstract", "")
@@ -37,19 +36,48 @@ def load_contextual_entries():
     return entries
 
 
-def generate_embeddings(entries):
+def write_embeddings(entries, output_path):
+    """Encode entries chunk by chunk, streaming metadata to JSONL and vectors into a float16 .npy."""
     print(f"🧠 Generating embeddings using model: {MODEL_NAME}")
-    for entry in tqdm(entries, desc="🔧 Encoding context entries"):
-        embedding = model.encode(entry["text"])
-        entry["embedding"] = embedding.tolist()
-    return entries
+    dimension = model.get_sentence_embedding_dimension()
+
+    # The same snippet often appears under several labels; each distinct text is encoded once
+    unique_index = {}
+    rows = np.fromiter(
+        (unique_index.setdefault(entry["text"], len(unique_index)) for entry in entries),
+        dtype=np.intp, count=len(entries)
+    )
+    unique_texts = list(unique_index)
+    print(f"🔁 {len(entries) - len(unique_texts)} duplicate contexts reuse an earlier embedding")
+
+    unique_embeddings = np.empty((len(unique_texts), dimension), dtype=np.float16)
+    devices = encode_devices()
+    pool = model.start_multi_process_pool(target_devices=devices) if devices else None
+    try:
+        with tqdm(total=len(unique_texts), desc="🧠 Embedding contexts") as pbar:
+            for start in range(0, len(unique_texts), ENCODE_CHUNK_SIZE):
+                texts = unique_texts[start:start + ENCODE_CHUNK_SIZE]
+                unique_embeddings[start:start + len(texts)] = encode_texts(texts, pool)
+                pbar.update(len(texts))
+    finally:
+        if pool is not None:
+            model.stop_multi_process_pool(pool)
+
+    # Rows line up with the JSONL lines; half precision halves the bytes on disk and in memory
+    matrix = np.lib.format.open_memmap(
+        output_path.with_suffix(".npy"), mode="w+", dtype=np.float16,
+        shape=(len(entries), dimension)
+    )
+    with open(output_path, "wb") as out_f:
+        for start in range(0, len(entries), ENCODE_CHUNK_SIZE):
+            chunk = entries[start:start + ENCODE_CHUNK_SIZE]
+            matrix[start:start + len(chunk)] = unique_embeddings[rows[start:start + len(chunk)]]
+            out_f.write(b"".join(orjson.dumps(entry, option=orjson.OPT_APPEND_NEWLINE) for entry in chunk))
+    matrix.flush()
 
 
 if __name__ == "__main__":
     contextual_entries = load_contextual_entries()
-    embedded = generate_embeddings(contextual_entries)
-
-    with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
-        json.dump(embedded, f, indent=2)
+    write_embeddings(contextual_entries, OUTPUT_PATH)
 
-    print(f"✅ Saved {len(embedded)} context embeddings to {OUTPUT_PATH}")
+    print(f"✅ Saved {len(contextual_entries)} context embeddings to {OUTPUT_PATH.with_suffix('.npy')}")
@@ -1,25 +1,22 @@
 # software_mention_pipeline/embed_software_library.py
 
-import json
+import numpy as np
+import orjson
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
+from embedding_model import model, ENCODE_CHUNK_SIZE, encode_devices, encode_texts
 from tqdm import tqdm
 
 # Paths
 ONTO_PATH_ASCL = Path("data/ascl_software.json")
 ONTO_PATH_ONTO = Path("data/ontosoft_software.json")
 FILTERED_LABELS_PATH = Path("data/filtered_labels.json")
-OUTPUT_EMBEDDINGS_PATH = Path("data/software_embeddings.json")
+# Metadata (label, source, text) as JSONL; the vectors go to the matching .npy
+OUTPUT_EMBEDDINGS_PATH = Path("data/software_embeddings.jsonl")
 SKIPPED_LOG_PATH = Path("data/skipped_labels.log")
 
-# Embedding model (NASA SMD fine-tuned)
-MODEL_NAME = "nasa-impact/nasa-smd-ibm-st-v2"
-model = SentenceTransformer(MODEL_NAME)
-
 
 def load_filtered_labels():
-    with open(FILTERED_LABELS_PATH, "r", encoding="utf-8") as f:
-        return set(json.load(f))
+    return set(orjson.loads(FILTERED_LABELS_PATH.read_bytes()))
 
 
 def load_software_entries(filtered_labels):
@@ -29,8 +26,8 @@ def load_software_entries(filtered_labels):
     print("🔎 Loading software entries...")
 
     # --- ASCL ---
-    with open(ONTO_PATH_ASCL, "r", encoding="utf-8") as f:
-        for entry in json.load(f):
+    with open(ONTO_PATH_ASCL, "rb") as f:
+        for entry in orjson.loads(f.read()):
             full_name = entry.get("name", "")
             description = entry.get("description")
 
@@ -54,8 +51,8 @@ def load_software_entries(filtered_labels):
             })
 
     # --- OntoSoft ---
-    with open(ONTO_PATH_ONTO, "r", encoding="utf-8") as f:
-        for entry in json.load(f):
+    with open(ONTO_PATH_ONTO, "rb") as f:
+        for entry in orjson.loads(f.read()):
             label = entry.get("label", "")
             description = entry.get("description")
 
@@ -82,20 +79,32 @@ def load_software_entries(filtered_labels):
     return entries
 
 
-def generate_embeddings(entries):
+def write_embeddings(entries, output_path):
+    """Encode entries chunk by chunk, streaming metadata to JSONL and vectors into a float16 .npy."""
     print("🧠 Generating embeddings with nasa-smd-ibm-st-v2...")
-    for entry in tqdm(entries, desc="Embedding entries"):
-        embedding = model.encode(entry["text"])
-        entry["embedding"] = embedding.tolist()
-    return entries
+    # Rows line up with the JSONL lines; half precision halves the bytes on disk and in memory
+    matrix = np.lib.format.open_memmap(
+        output_path.with_suffix(".npy"), mode="w+", dtype=np.float16,
+        shape=(len(entries), model.get_sentence_embedding_dimension())
+    )
+    devices = encode_devices()
+    pool = model.start_multi_process_pool(target_devices=devices) if devices else None
+    try:
+        with open(output_path, "wb") as out_f, tqdm(total=len(entries), desc="🧠 Embedding software entries") as pbar:
+            for start in range(0, len(entries), ENCODE_CHUNK_SIZE):
+                chunk = entries[start:start + ENCODE_CHUNK_SIZE]
+                matrix[start:start + len(chunk)] = encode_texts([entry["text"] for entry in chunk], pool)
+                out_f.write(b"".join(orjson.dumps(entry, option=orjson.OPT_APPEND_NEWLINE) for entry in chunk))
+                pbar.update(len(chunk))
+    finally:
+        if pool is not None:
+            model.stop_multi_process_pool(pool)
+    matrix.flush()
 
 
 if __name__ == "__main__":
     filtered_labels = load_filtered_labels()
     entries = load_software_entries(filtered_labels)
-    embedded = generate_embeddings(entries)
-
-    with open(OUTPUT_EMBEDDINGS_PATH, "w", encoding="utf-8") as f:
-        json.dump(embedded, f, indent=2)
+    write_embeddings(entries, OUTPUT_EMBEDDINGS_PATH)
 
     print(f"✅ Software embeddings saved to {OUTPUT_EMBEDDINGS_PATH}")
@@ -0,0 +1,48 @@
+# software_mention_pipeline/embedding_model.py
+# Sentence-transformer model and encoding shared by embed_contextual_mentions.py and embed_software_library.py
+import os
+import torch
+from torch_setup import configure_threads
+from sentence_transformers import SentenceTransformer
+
+# Embedding model (NASA SMD fine-tuned)
+MODEL_NAME = "nasa-impact/nasa-smd-ibm-st-v2"
+EMBED_BATCH_SIZE = 64
+# Entries encoded and written per step, bounding memory held for any one step
+ENCODE_CHUNK_SIZE = 10_000
+# Comma-separated devices for a multi-process encode pool, e.g. "cuda:0,cuda:1" or "cpu,cpu,cpu,cpu"
+EMBED_DEVICES = os.environ.get("EMBED_DEVICES", "")
+# "torch" (default), or "onnx"/"openvino" for optimized CPU inference (sentence-transformers >= 3.2)
+EMBED_BACKEND = os.environ.get("EMBED_BACKEND", "torch")
+
+configure_threads()
+
+if EMBED_BACKEND == "torch":
+    model = SentenceTransformer(MODEL_NAME)
+    if torch.cuda.is_available():
+        # Half precision doubles tensor-core throughput; vectors are stored as float16 regardless
+        model = model.to("cuda").half()
+else:
+    # Exported on first use and run through onnxruntime/OpenVINO with graph optimizations
+    model = SentenceTransformer(MODEL_NAME, backend=EMBED_BACKEND)
+
+
+def encode_devices():
+    """Devices to spread encoding over, or None to encode in this process."""
+    if EMBED_DEVICES:
+        return [device.strip() for device in EMBED_DEVICES.split(",") if device.strip()]
+    if torch.cuda.device_count() > 1:
+        return [f"cuda:{i}" for i in range(torch.cuda.device_count())]
+    return None
+
+
+def encode_texts(texts, pool=None):
+    # Both paths group texts by length internally and return them in input order
+    if pool is not None:
+        return model.encode_multi_process(texts, pool, batch_size=EMBED_BATCH_SIZE)
+    return model.encode(
+        texts,
+        batch_size=EMBED_BATCH_SIZE,
+        convert_to_numpy=True,
+        show_progress_bar=False
+    )
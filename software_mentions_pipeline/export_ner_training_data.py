@@ -1,52 +1,76 @@
 # software_mention_pipeline/export_ner_training_data.py
-import json
+import orjson
+import ahocorasick
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 from pathlib import Path
 from tqdm import tqdm
 
-INPUT_PATH = Path("data/labeled_contexts.jsonl")
+INPUT_PATH = Path("data/labeled_contexts.parquet")
 OUTPUT_PATH = Path("data/ner_training_data.jsonl")
 
 SIMILARITY_THRESHOLD = 0.6
 
 
+def build_label_automaton(labels):
+    """One Aho-Corasick automaton over every label, each mapped to itself."""
+    automaton = ahocorasick.Automaton()
+    for label in labels:
+        if label:
+            automaton.add_word(label, label)
+    if len(automaton):
+        automaton.make_automaton()
+    return automaton
+
+
+def find_label_spans(text, label, automaton):
+    """Non-overlapping (start, end) spans of label in text, scanning left to right."""
+    if not len(automaton) or not text:
+        return []
+    spans = []
+    last_end = 0
+    # Hits arrive in order of end position; for one label that is also start order
+    for end, matched in automaton.iter(text):
+        start = end - len(matched) + 1
+        if matched == label and start >= last_end:
+            spans.append((start, end + 1))
+            last_end = end + 1
+    return spans
+
+
 def extract_ner_training_examples():
     training_examples = []
 
-    with open(INPUT_PATH, "r", encoding="utf-8") as f_in:
-        for line in tqdm(f_in, desc="✂️ Exporting NER training data"):
-            record = json.loads(line)
-            similarity = record.get("embedding_similarity", 0)
-            label = record.get("label")
-            text = record.get("context", "")
-
-            if similarity < SIMILARITY_THRESHOLD:
-                continue
-
-            # Find all occurrences of the label in the context (case-sensitive exact match)
-            spans = []
-            start = 0
-            while True:
-                index = text.find(label, start)
-                if index == -1:
-                    break
-                spans.append({
-                    "start": index,
-                    "end": index + len(label),
-                    "label": "SOFTWARE"
-                })
-                start = index + len(label)
-
-            if spans:
-                training_examples.append({
-                    "text": text,
-                    "entities": spans
-                })
+    # Every label is compiled into one automaton up front instead of searched per record
+    labels = pc.unique(pq.read_table(INPUT_PATH, columns=["label"])["label"]).to_pylist()
+    automaton = build_label_automaton(labels)
+
+    parquet_file = pq.ParquetFile(INPUT_PATH)
+    records = (record for batch in parquet_file.iter_batches() for record in batch.to_pylist())
+    for record in tqdm(records, total=parquet_file.metadata.num_rows, desc="✂️ Exporting NER training data"):
+        similarity = record.get("embedding_similarity", 0)
+        label = record.get("label")
+        text = record.get("context", "")
+
+        if similarity < SIMILARITY_THRESHOLD:
+            continue
+
+        # Find all occurrences of the label in the context (case-sensitive exact match)
+        spans = [
+            {"start": start, "end": end, "label": "SOFTWARE"}
+            for start, end in find_label_spans(text, label, automaton)
+        ]
+
+        if spans:
+            training_examples.append({
+                "text": text,
+                "entities": spans
+            })
 
     # Save output
-    with open(OUTPUT_PATH, "w", encoding="utf-8") as f_out:
+    with open(OUTPUT_PATH, "wb") as f_out:
         for example in training_examples:
-            json.dump(example, f_out)
-            f_out.write("\n")
+            f_out.write(orjson.dumps(example, option=orjson.OPT_APPEND_NEWLINE))
 
     print(f"✅ Exported {len(training_examples)} NER training examples to {OUTPUT_PATH}")
 
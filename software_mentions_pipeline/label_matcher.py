@@ -0,0 +1,88 @@
+# software_mention_pipeline/label_matcher.py
+# Exact label matching shared by batch_filter.py and batch_filter_context.py
+import re
+import ahocorasick
+
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+# Token shape the old token-set lookup used
+_TOKEN_RE = re.compile(r"\b[\w\-]+\b")
+
+
+def label_entries(labels):
+    """(label, is_phrase) pairs for every label that can match."""
+    entries = []
+    for label in labels:
+        is_phrase = " " in label
+        # Single words are matched as whole tokens, so skip any that can never be one
+        if is_phrase or _TOKEN_RE.fullmatch(label):
+            entries.append((label, is_phrase))
+    return entries
+
+
+def build_automaton(entries):
+    """One Aho-Corasick automaton over every label."""
+    automaton = ahocorasick.Automaton()
+    for label, is_phrase in entries:
+        automaton.add_word(label, (label, is_phrase))
+    automaton.make_automaton()
+    return automaton
+
+
+def build_database(entries):
+    """Compile every label into one Hyperscan block-mode database, if available.
+
+    Hyperscan has no lookaround, so labels are compiled as plain literals and
+    hits go through the same boundary check as automaton hits.
+    """
+    if hyperscan is None:
+        return None
+    database = hyperscan.Database(mode=hyperscan.HS_MODE_BLOCK)
+    database.compile(
+        expressions=[re.escape(label).encode("utf-8") for label, _ in entries],
+        ids=list(range(len(entries))),
+        elements=len(entries),
+        flags=[hyperscan.HS_FLAG_SOM_LEFTMOST] * len(entries),
+    )
+    return database
+
+
+def iter_label_hits(text, entries, automaton, database=None):
+    """Yield (start, end, label, is_phrase) for every occurrence of a label in text."""
+    # Hyperscan reports byte offsets, which only line up with str offsets for ASCII
+    if database is not None and text.isascii():
+        hits = []
+        database.scan(text.encode("ascii"),
+                      match_event_handler=lambda i, start, end, flags, ctx: hits.append((i, start, end)))
+        for i, start, end in hits:
+            label, is_phrase = entries[i]
+            yield start, end, label, is_phrase
+    else:
+        for end, (label, is_phrase) in automaton.iter(text):
+            yield end - len(label) + 1, end + 1, label, is_phrase
+
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == "_"
+
+
+def _joins_token(text, i, step):
+    """True if text[i] continues a [\\w-] token, looking past any hyphens."""
+    while 0 <= i < len(text) and text[i] == "-":
+        i += step
+    return 0 <= i < len(text) and _is_word_char(text[i])
+
+
+def is_exact_hit(text, start, end, is_phrase):
+    """Apply the original boundary rules to an automaton hit at text[start:end].
+
+    Phrases need non-word characters on both sides; single words must be a
+    whole hyphenated token, as the old token-set lookup required.
+    """
+    if is_phrase:
+        return not ((start > 0 and _is_word_char(text[start - 1])) or
+                    (end < len(text) and _is_word_char(text[end])))
+    return not (_joins_token(text, start - 1, -1) or _joins_token(text, end, 1))
@@ -1,5 +1,5 @@
 # software_mention_pipeline/labeling_tool.py
-import sqlite3
+from load_inputs import connect
 
 DB_PATH = "data/match_candidates.db"
 
@@ -12,7 +12,8 @@ LABELS = {
 
 
 def label_records():
-    conn = sqlite3.connect(DB_PATH)
+    # Same WAL/synchronous settings as the loaders, so each label's commit stays cheap
+    conn = connect(DB_PATH)
     cur = conn.cursor()
 
     cur.execute("SELECT rowid, bibcode, label, match_type, context FROM candidates WHERE final_classification IS NULL")
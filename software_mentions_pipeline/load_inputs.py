@@ -1,5 +1,5 @@
 # software_mention_pipeline/load_inputs.py
-import json
+import orjson
 import sqlite3
 from pathlib import Path
 
@@ -11,18 +11,33 @@ LABELS_PATH = Path("data/labels.json")
 
 
 def load_json(path):
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return orjson.loads(Path(path).read_bytes())
 
 
 def load_jsonl(path):
-    with open(path, "r", encoding="utf-8") as f:
+    with open(path, "rb") as f:
         for line in f:
-            yield json.loads(line)
+            yield orjson.loads(line)
+
+
+def connect(db_path=DB_PATH):
+    """Open the candidates database tuned for bulk loads.
+
+    WAL lets readers (e.g. labeling_tool.py) work during a load, and with
+    synchronous=NORMAL a commit no longer waits on an fsync of the main file.
+    """
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA cache_size=-64000;
+    """)
+    return conn
 
 
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect()
     cur = conn.cursor()
     cur.execute("""
         CREATE TABLE IF NOT EXISTS candidates (
@@ -66,8 +81,8 @@ def load_software_labels():
 
 
 def save_labels(labels):
-    with open(LABELS_PATH, "w", encoding="utf-8") as f:
-        json.dump(labels, f, indent=2)
+    # Kept indented: this file is curated by hand into filtered_labels.json
+    LABELS_PATH.write_bytes(orjson.dumps(labels, option=orjson.OPT_INDENT_2))
 
 
 if __name__ == "__main__":
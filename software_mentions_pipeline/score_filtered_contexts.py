@@ -1,19 +1,29 @@
 # software_mention_pipeline/score_filtered_contexts.py
 
-import json
+import orjson
+import re
+import shelve
+from hashlib import blake2b
 from pathlib import Path
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 import torch
+from torch_setup import configure_threads
 from transformers import pipeline
 from nltk.tokenize import sent_tokenize
 from tqdm import tqdm
 
 # === File paths ===
-CONTEXT_EMBEDDINGS_PATH = Path("data/context_embeddings.json")
-SOFTWARE_EMBEDDINGS_PATH = Path("data/software_embeddings.json")
+CONTEXT_EMBEDDINGS_PATH = Path("data/context_embeddings.jsonl")
+SOFTWARE_EMBEDDINGS_PATH = Path("data/software_embeddings.jsonl")
 FILTERED_LABELS_PATH = Path("data/filtered_labels.json")
 OUTPUT_PATH = Path("data/scored_contexts.jsonl")
+# Context rows normalized at a time when computing similarities
+SIMILARITY_CHUNK_ROWS = 65_536
+# Entity groups per (model, sentence), kept across runs
+NER_CACHE_PATH = Path("data/ner_cache")
+NER_BATCH_SIZE = 32
+# Sentences per pipeline call; an error only loses the sentences of its slice
+NER_SLICE_SIZE = 2048
 
 # === Heuristic setup ===
 SOFTWARE_KEYWORDS = {
@@ -22,6 +32,8 @@ SOFTWARE_KEYWORDS = {
 }
 RECOGNIZED_SOFTWARE_TAGS = {"SOFTWARE", "Software", "tool", "software", "application_mention", "TOOL", "Tool", "Application_Mention"}
 
+configure_threads()
+
 # === Load NER models ===
 device = 0 if torch.cuda.is_available() else -1
 ner_pipes = {
@@ -42,82 +54,183 @@ ner_pipes = {
 }
 
 
+def normalize_rows(matrix):
+    """float32 copy of matrix with unit-length rows; zero rows stay zero, as in cosine_similarity."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def iter_jsonl(path):
+    with open(path, "rb") as f:
+        for line in f:
+            yield orjson.loads(line)
+
+
 def load_embeddings():
-    with open(SOFTWARE_EMBEDDINGS_PATH, "r", encoding="utf-8") as f:
-        software_embeddings = {
-            entry["label"]: np.array(entry["embedding"]) for entry in json.load(f)
-        }
+    # Vectors are float16 .npy files mapped read-only; the JSONL files hold one entry per row
+    software_entries = list(iter_jsonl(SOFTWARE_EMBEDDINGS_PATH))
+    software_norm = normalize_rows(np.load(SOFTWARE_EMBEDDINGS_PATH.with_suffix(".npy"), mmap_mode="r"))
+    # Later rows win for repeated labels, as the old dict comprehension did
+    label_to_row = {entry["label"]: i for i, entry in enumerate(software_entries)}
 
-    with open(CONTEXT_EMBEDDINGS_PATH, "r", encoding="utf-8") as f:
-        context_entries = json.load(f)
+    # Context metadata is streamed by main(); only the mapped matrix is opened here
+    context_matrix = np.load(CONTEXT_EMBEDDINGS_PATH.with_suffix(".npy"), mmap_mode="r")
 
-    with open(FILTERED_LABELS_PATH, "r", encoding="utf-8") as f:
-        valid_labels = set(json.load(f))  # keep original casing
-    return software_embeddings, context_entries, valid_labels
+    valid_labels = set(orjson.loads(FILTERED_LABELS_PATH.read_bytes()))  # keep original casing
+    return label_to_row, software_norm, context_matrix, valid_labels
 
 
-def compute_similarity(vec1, vec2):
-    return float(cosine_similarity([vec1], [vec2])[0][0])
+def compute_similarities(context_matrix, software_norm, context_rows, software_rows):
+    """Cosine similarity of each context row with its label's row.
 
+    Context rows are gathered and normalized a chunk at a time, so the
+    float16 matrix is never copied whole into float32.
+    """
+    sims = np.empty(len(context_rows), dtype=np.float32)
+    for start in range(0, len(context_rows), SIMILARITY_CHUNK_ROWS):
+        end = start + SIMILARITY_CHUNK_ROWS
+        sims[start:end] = np.einsum(
+            "nd,nd->n",
+            normalize_rows(context_matrix[context_rows[start:end]]),
+            software_norm[software_rows[start:end]]
+        )
+    return sims
 
-def run_ner_on_text(text, label, model_key):
-    try:
-        ner_model = ner_pipes[model_key]
-        sentences = sent_tokenize(text)
-        relevant = [s for s in sentences if label in s]
-        for sent in relevant:
-            ner_results = ner_model(sent[:512])
-            for ent in ner_results:
-                if ent["entity_group"] in RECOGNIZED_SOFTWARE_TAGS:
-                    return True
-        return False
-    except Exception as e:
-        print(f"⚠️ NER-{model_key} error: {e}")
-        return False
 
+# The same sentences recur across the labels of one document, so each is run once per model
+ner_cache = {}
 
-def keyword_hits(text):
-    return sorted([kw for kw in SOFTWARE_KEYWORDS if kw in text.lower()])
 
+def ner_cache_key(model_key, sent):
+    return f"{model_key}:{blake2b(sent.encode('utf-8'), digest_size=16).hexdigest()}"
+
+
+# Compiled whole-word pattern per label, built on first use
+label_patterns = {}
+
+
+def label_pattern(label):
+    pattern = label_patterns.get(label)
+    if pattern is None:
+        # Lookarounds rather than \b, so labels ending in symbols (e.g. "C++") still match
+        pattern = label_patterns[label] = re.compile(rf"(?<!\w){re.escape(label)}(?!\w)")
+    return pattern
 
-def main():
-    software_embeddings, context_entries, valid_labels = load_embeddings()
-    print(f"✅ Loaded {len(software_embeddings)} software embeddings and {len(context_entries)} context entries.")
 
-    with open(OUTPUT_PATH, "w", encoding="utf-8") as out_f:
-        for entry in tqdm(context_entries, desc="📊 Scoring context entries"):
-            label = entry["label"]  # preserve casing
-            if label not in valid_labels:
-                continue
+def relevant_sentences(text, label):
+    """Sentences of text that mention label as a whole word, truncated to what the NER models see."""
+    # Texts that never mention the label skip sentence splitting altogether
+    if label not in text:
+        return []
+    pattern = label_pattern(label)
+    return [sent[:512] for sent in sent_tokenize(text) if pattern.search(sent)]
 
-            context_text = entry["text"]
-            context_vec = np.array(entry["embedding"])
 
-            heuristics = keyword_hits(context_text)
-            ner_tag_oeg = run_ner_on_text(context_text, label, "oeg")
-            ner_tag_ibm = run_ner_on_text(context_text, label, "ibm")
+def run_ner_batch(sentences, model_key):
+    """Tag every sentence not yet in ner_cache, NER_SLICE_SIZE sentences per batched pipeline call."""
+    pending = list(dict.fromkeys(
+        sent for sent in sentences if ner_cache_key(model_key, sent) not in ner_cache
+    ))
+    for start in tqdm(range(0, len(pending), NER_SLICE_SIZE), desc=f"🏷️ NER-{model_key} slices"):
+        batch = pending[start:start + NER_SLICE_SIZE]
+        try:
+            results = ner_pipes[model_key](batch, batch_size=NER_BATCH_SIZE)
+        except Exception as e:
+            print(f"⚠️ NER-{model_key} error on sentences {start}-{start + len(batch) - 1}: {e}")
+            continue
+        for sent, ner_results in zip(batch, results):
+            ner_cache[ner_cache_key(model_key, sent)] = [ent["entity_group"] for ent in ner_results]
+
+
+def has_software_tag(sentences, model_key):
+    """True if the model tagged a software entity in any of the sentences."""
+    for sent in sentences:
+        entity_groups = ner_cache.get(ner_cache_key(model_key, sent), ())
+        if any(group in RECOGNIZED_SOFTWARE_TAGS for group in entity_groups):
+            return True
+    return False
+
+
+def keyword_hits(text):
+    lowered = text.lower()
+    return sorted(kw for kw in SOFTWARE_KEYWORDS if kw in lowered)
+
+
+def main():
+    label_to_row, software_norm, context_matrix, valid_labels = load_embeddings()
+    with shelve.open(str(NER_CACHE_PATH)) as disk_cache:
+        ner_cache.update(disk_cache)
+    cached_keys = set(ner_cache)
+
+    # Pass 1: stream the context metadata, keeping per entry only what scoring needs:
+    # its keyword hits and the sentences mentioning its label (split once for both models)
+    records = []
+    context_count = 0
+    for i, entry in enumerate(tqdm(iter_jsonl(CONTEXT_EMBEDDINGS_PATH), desc="✂️ Reading context entries")):
+        context_count += 1
+        label = entry["label"]  # preserve casing
+        if label not in valid_labels:
+            continue
+        records.append({
+            "row": i,
+            "bibcode": entry["bibcode"],
+            "label": label,
+            "heuristic_keywords": keyword_hits(entry["text"]),
+            "sentences": relevant_sentences(entry["text"], label)
+        })
+    print(f"✅ Loaded {len(label_to_row)} software embeddings and {context_count} context entries.")
+
+    # Every similarity is computed up front; the loop below only looks them up
+    scorable = [record for record in records if record["label"] in label_to_row]
+    sims = compute_similarities(
+        context_matrix, software_norm,
+        np.array([record["row"] for record in scorable], dtype=np.intp),
+        np.array([label_to_row[record["label"]] for record in scorable], dtype=np.intp)
+    )
+    sim_scores = {record["row"]: sim for record, sim in zip(scorable, sims.tolist())}
+
+    # Pass 2: one batched call per model over every sentence it has not tagged yet.
+    # Scoring only uses ner_tag_any, so IBM runs just on entries OEG did not tag.
+    oeg_sentences = [sent for record in records for sent in record["sentences"]]
+    print(f"🏷️ Running NER-oeg over {len(oeg_sentences)} sentences")
+    run_ner_batch(oeg_sentences, "oeg")
+    for record in records:
+        record["ner_tag_oeg"] = has_software_tag(record["sentences"], "oeg")
+
+    ibm_sentences = [
+        sent for record in records if not record["ner_tag_oeg"] for sent in record["sentences"]
+    ]
+    print(f"🏷️ Running NER-ibm over {len(ibm_sentences)} sentences")
+    run_ner_batch(ibm_sentences, "ibm")
+
+    with open(OUTPUT_PATH, "wb") as out_f:
+        for record in tqdm(records, desc="📊 Scoring context entries"):
+            label = record["label"]
+            ner_tag_oeg = record["ner_tag_oeg"]
+            # None when IBM was skipped because OEG already tagged the entry
+            ner_tag_ibm = None if ner_tag_oeg else has_software_tag(record["sentences"], "ibm")
             ner_tag_any = ner_tag_oeg or ner_tag_ibm
 
-            sim_score = None
-            if label in software_embeddings:
-                sim_score = compute_similarity(software_embeddings[label], context_vec)
-            else:
+            sim_score = sim_scores.get(record["row"])
+            if sim_score is None:
                 print(f"⚠️ No software embedding found for label: {label}")
 
             result = {
-                "bibcode": entry["bibcode"],
+                "bibcode": record["bibcode"],
                 "label": label,
-                "heuristic_keywords": heuristics,
+                "heuristic_keywords": record["heuristic_keywords"],
                 "ner_tag_oeg": ner_tag_oeg,
                 "ner_tag_ibm": ner_tag_ibm,
                 "ner_tag_any": ner_tag_any,
                 "embedding_similarity": sim_score
             }
-            json.dump(result, out_f)
-            out_f.write("\n")
+            out_f.write(orjson.dumps(result, option=orjson.OPT_APPEND_NEWLINE))
 
-    print(f"✅ Scoring complete. Results saved to {OUTPUT_PATH}")
+    with shelve.open(str(NER_CACHE_PATH)) as disk_cache:
+        disk_cache.update({key: groups for key, groups in ner_cache.items() if key not in cached_keys})
 
+    print(f"✅ Scoring complete. Results saved to {OUTPUT_PATH}")
 
 if __name__ == "__main__":
     main()
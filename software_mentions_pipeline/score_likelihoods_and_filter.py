@@ -1,13 +1,15 @@
 # software_mention_pipeline/score_likelihoods_and_filter.py
 
-import json
+import orjson
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 from pathlib import Path
-from tqdm import tqdm
+from assign_likelihood_labels import read_scored_contexts
 
 SCORED_CONTEXTS_PATH = Path("data/scored_contexts.jsonl")
 ALL_OUTPUT_PATH = Path("data/all_scored_mentions.jsonl")
 LIKELY_OUTPUT_PATH = Path("data/likely_mentions.jsonl")
-
 # === Threshold Tuning Weights ===
 WEIGHT_NER = 0.5
 WEIGHT_EMBED = 0.3
@@ -21,54 +23,64 @@ LIKELIHOOD_THRESHOLDS = {
 }
 
 
-def calculate_score(entry):
-    score = 0.0
-    score += WEIGHT_NER * (1.0 if entry.get("ner_tag") else 0.0)
-    embed = entry.get("embedding_similarity")
-    score += WEIGHT_EMBED * (embed if embed is not None else 0.0)
-    keyword_count = len(entry.get("heuristic_keywords", []))
-    score += WEIGHT_KEYWORDS * min(keyword_count / 3.0, 1.0)
-    return round(score, 3)
-
-
-def assign_likelihood(score):
-    for label, threshold in LIKELIHOOD_THRESHOLDS.items():
-        if score >= threshold:
-            return label
-    return "unlikely"
+def _column(table, name, default):
+    """Column as a float64 array with nulls (and a missing column) filled with default."""
+    if name not in table.column_names or pa.types.is_null(table[name].type):
+        return np.full(table.num_rows, default, dtype=np.float64)
+    return pc.fill_null(pc.cast(table[name], pa.float64()), default).to_numpy(zero_copy_only=False)
+
+
+def calculate_scores(table):
+    """Weighted score for every record, computed over whole columns at once."""
+    # scored_contexts.jsonl records whether either NER model tagged the label as ner_tag_any
+    if "ner_tag_any" in table.column_names and pa.types.is_boolean(table["ner_tag_any"].type):
+        ner = pc.fill_null(table["ner_tag_any"], False).to_numpy(zero_copy_only=False).astype(np.float64)
+    else:
+        ner = np.zeros(table.num_rows, dtype=np.float64)
+    embed = _column(table, "embedding_similarity", 0.0)
+    if "heuristic_keywords" in table.column_names and pa.types.is_list(table["heuristic_keywords"].type):
+        keyword_count = pc.fill_null(pc.list_value_length(table["heuristic_keywords"]), 0).to_numpy(zero_copy_only=False)
+    else:
+        keyword_count = np.zeros(table.num_rows)
+    score = (WEIGHT_NER * ner
+             + WEIGHT_EMBED * embed
+             + WEIGHT_KEYWORDS * np.minimum(keyword_count / 3.0, 1.0))
+    return np.round(score, 3)
+
+
+def assign_likelihoods(scores):
+    """Likelihood label for every score, bucketed against the ascending thresholds."""
+    ordered = sorted(LIKELIHOOD_THRESHOLDS.items(), key=lambda item: item[1])
+    labels = np.array([label for label, _ in ordered])
+    # Scores below the lowest threshold still count as its label
+    buckets = np.searchsorted([threshold for _, threshold in ordered[1:]], scores, side="right")
+    return labels[buckets]
 
 
 def score_and_filter():
-    with open(SCORED_CONTEXTS_PATH, "r", encoding="utf-8") as f:
-        entries = [json.loads(line) for line in f]
-
-    all_scored = []
-    likely_mentions = []
-
-    for entry in tqdm(entries, desc="🧮 Scoring and classifying mentions"):
-        score = calculate_score(entry)
-        likelihood = assign_likelihood(score)
-
-        result = {
-            "bibcode": entry["bibcode"],
-            "label": entry["label"],
-            "likelihood": likelihood,
-            "score": score
-        }
-        all_scored.append(result)
-
-        if likelihood in {"somewhat likely", "very likely"}:
-            likely_mentions.append(result)
-
-    with open(ALL_OUTPUT_PATH, "w", encoding="utf-8") as out_all:
-        for r in all_scored:
-            json.dump(r, out_all)
-            out_all.write("\n")
-
-    with open(LIKELY_OUTPUT_PATH, "w", encoding="utf-8") as out_likely:
-        for r in likely_mentions:
-            json.dump(r, out_likely)
-            out_likely.write("\n")
+    # An empty input gives an empty table, and so empty outputs
+    table = read_scored_contexts(SCORED_CONTEXTS_PATH)
+
+    scores = calculate_scores(table)
+    likelihoods = assign_likelihoods(scores)
+
+    all_scored = [
+        {"bibcode": bibcode, "label": label, "likelihood": likelihood, "score": score}
+        for bibcode, label, likelihood, score in zip(
+            table["bibcode"].to_pylist(), table["label"].to_pylist(),
+            likelihoods.tolist(), scores.tolist()
+        )
+    ]
+    likely_mentions = [
+        result for result in all_scored
+        if result["likelihood"] in {"somewhat likely", "very likely"}
+    ]
+
+    with open(ALL_OUTPUT_PATH, "wb") as out_all:
+        out_all.write(b"".join(orjson.dumps(r, option=orjson.OPT_APPEND_NEWLINE) for r in all_scored))
+
+    with open(LIKELY_OUTPUT_PATH, "wb") as out_likely:
+        out_likely.write(b"".join(orjson.dumps(r, option=orjson.OPT_APPEND_NEWLINE) for r in likely_mentions))
 
     print(f"✅ Wrote {len(all_scored)} total mentions to {ALL_OUTPUT_PATH}")
     print(f"✅ Wrote {len(likely_mentions)} likely mentions to {LIKELY_OUTPUT_PATH}")
@@ -3,6 +3,9 @@
 from transformers import pipeline
 from pprint import pprint
 import torch
+from torch_setup import configure_threads
+
+configure_threads()
 
 # Initialize the INDUS model
 model_id = "adsabs/nasa-smd-ibm-v0.1_NER_DEAL"
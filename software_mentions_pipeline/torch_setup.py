@@ -0,0 +1,12 @@
+# software_mention_pipeline/torch_setup.py
+import os
+import torch
+
+# CPU inference threads used unless TORCH_THREADS is set
+DEFAULT_TORCH_THREADS = min(8, os.cpu_count() or 1)
+
+
+def configure_threads():
+    """Set torch's CPU inference threads before any model is loaded (no effect on GPU runs)."""
+    torch.set_num_threads(int(os.environ.get("TORCH_THREADS", DEFAULT_TORCH_THREADS)))
+    torch.set_num_interop_threads(1)
@@ -2,7 +2,11 @@
 """Main Streamlit dashboard for entity extractor with integrated search functionality."""
 
 import streamlit as st
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from collections import defaultdict
 from pathlib import Path
 import sys
 import gzip
@@ -15,16 +19,19 @@ from components.result_tables import render_results_table
 from components.autocomplete import render_autocomplete_search
 from components.autocomplete_simple import render_simple_autocomplete_search
 
-# Page configuration
-st.set_page_config(
-    page_title="Entity Extractor Dashboard",
-    page_icon="🔍",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
+# Chunks sent through the NER pipeline per forward pass
+NER_BATCH_SIZE = 16
+# Low-cardinality string columns held as categoricals: searches scan the unique
+# values only, and groupby/nunique work on integer codes
+CATEGORY_COLUMNS = ['term_name', 'bibcode', 'match_location', 'bibcode_label']
+# Context tabs shown per term, in display order
+CONTEXT_GROUPS = ['positive', 'uncurated', 'negative']
+
+DATA_PATH = Path("../optimized_extractor/results/exports/software_mentions_all_with_labels.csv.gzip")
+DELTA_PATH = Path("curation_delta.csv")
 
 # Custom CSS for better styling
-st.markdown("""
+_CSS = """
 <style>
     .main-header {
         font-size: 2.5rem;
@@ -55,11 +62,12 @@ st.markdown("""
         margin: 1rem 0;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
 
 def load_delta_changes():
     """Load any existing curation changes from delta file."""
-    delta_path = Path("curation_delta.csv")
+    delta_path = DELTA_PATH
     
     if not delta_path.exists():
         return pd.DataFrame(columns=['row_id', 'bibcode_label', 'curator', 'timestamp'])
@@ -71,63 +79,146 @@ def load_delta_changes():
         return pd.DataFrame(columns=['row_id', 'bibcode_label', 'curator', 'timestamp'])
 
 
-@st.cache_data
 def load_software_mentions_data():
     """Load the software mentions data from compressed CSV with row_id and delta merging."""
-    csv_path = Path("../optimized_extractor/results/exports/software_mentions_all_with_labels.csv.gzip")
-    
-    if not csv_path.exists():
-        st.error(f"❌ Data file not found at {csv_path}")
+    if not DATA_PATH.exists():
+        st.error(f"❌ Data file not found at {DATA_PATH}")
         st.info("Please make sure the extraction pipeline has been run.")
         return None
     
+    # The modification times key the disk cache, so a re-exported CSV or an edited delta file
+    # (even from another process) is reloaded rather than served from a stale pickle
+    delta_mtime = DELTA_PATH.stat().st_mtime_ns if DELTA_PATH.exists() else None
+    return _load_software_mentions_data(DATA_PATH.stat().st_mtime_ns, delta_mtime)
+
+
+@st.cache_data(persist="disk", show_spinner=False)
+def _load_software_mentions_data(csv_mtime: int, delta_mtime):
+    """Cached body of load_software_mentions_data for one version of the CSV and delta file."""
+    csv_path = DATA_PATH
+    # Parsed copy of the CSV (before delta merging), written on the first load
+    parquet_path = csv_path.with_name("software_mentions_all_with_labels.parquet")
+    
     try:
         with st.spinner("Loading software mentions data (612k+ records)..."):
-            # Load main dataset
-            df = pd.read_csv(csv_path, compression='gzip')
-            
-            # Add row_id as unique identifier for each row
-            df = df.reset_index(drop=True)
-            df['row_id'] = df.index
+            if parquet_path.exists() and parquet_path.stat().st_mtime >= csv_path.stat().st_mtime:
+                # Categorical columns and derived fields round-trip through the Parquet metadata
+                df = pd.read_parquet(parquet_path)
+            else:
+                # Load main dataset
+                df = pd.read_csv(
+                    csv_path,
+                    compression='gzip',
+                    engine='pyarrow',
+                    dtype={column: 'category' for column in CATEGORY_COLUMNS}
+                )
+                
+                # Add row_id as unique identifier for each row
+                df = df.reset_index(drop=True)
+                df['row_id'] = df.index
+                
+                try:
+                    df.to_parquet(parquet_path, compression='zstd')
+                except Exception as e:
+                    st.warning(f"Could not write Parquet cache: {e}")
             
             # Load any curation changes from delta file
             delta_df = load_delta_changes()
             
             # Merge delta changes with main dataset
             if not delta_df.empty:
-                # Create a mapping of row_id to updated bibcode_label
-                label_updates = dict(zip(delta_df['row_id'], delta_df['bibcode_label']))
+                # Latest change per row_id wins; row_id is the row's position in df
+                label_updates = delta_df.drop_duplicates('row_id', keep='last')
+                
+                # Curated labels not present in the export must exist as categories before assignment
+                new_labels = set(label_updates['bibcode_label'].dropna()) - set(df['bibcode_label'].cat.categories)
+                if new_labels:
+                    df['bibcode_label'] = df['bibcode_label'].cat.add_categories(sorted(new_labels))
                 
-                # Apply updates to main dataframe
-                for row_id, new_label in label_updates.items():
-                    if row_id < len(df):
-                        df.loc[row_id, 'bibcode_label'] = new_label
+                # Apply updates to main dataframe in one positional assignment
+                in_range = label_updates[label_updates['row_id'] < len(df)]
+                df.iloc[in_range['row_id'].to_numpy(), df.columns.get_loc('bibcode_label')] = (
+                    in_range['bibcode_label'].to_numpy()
+                )
                 
                 st.info(f"✅ Applied {len(label_updates)} curation changes from delta file")
             
+            # Selectbox previews and context tabs, derived once per load instead of per render
+            contexts = df['context'].astype('str')
+            df['context_preview'] = contexts.str.slice(0, 50).where(
+                contexts.str.len() <= 50, contexts.str.slice(0, 50) + "..."
+            )
+            labels = df['bibcode_label']
+            df['context_group'] = pd.Categorical(
+                np.select(
+                    [labels == 'positive', labels.isin(['negative', 'unknown'])],
+                    ['positive', 'negative'],
+                    default='uncurated'
+                ),
+                categories=CONTEXT_GROUPS
+            )
+            
         return df
     except Exception as e:
         st.error(f"❌ Error loading data: {e}")
         return None
 
 
+def contains_literal(values, search_query: str) -> np.ndarray:
+    """Boolean mask of values containing search_query (case-insensitive, literal substring; nulls never match)."""
+    # Arrow's substring kernel runs in C++ without going through Python's regex engine
+    matches = pc.match_substring(pa.array(values, from_pandas=True), search_query, ignore_case=True)
+    return matches.fill_null(False).to_numpy(zero_copy_only=False)
+
+
+@st.cache_resource
+def build_term_trigram_index(term_categories: pd.Index) -> Dict[str, np.ndarray]:
+    """Map each lowercased character trigram to the positions of the terms containing it."""
+    postings = defaultdict(list)
+    for position, term in enumerate(term_categories.str.lower()):
+        for trigram in {term[i:i + 3] for i in range(len(term) - 2)}:
+            postings[trigram].append(position)
+    return {trigram: np.array(positions, dtype=np.int64) for trigram, positions in postings.items()}
+
+
+def matching_term_positions(term_categories: pd.Index, search_query: str) -> np.ndarray:
+    """Positions of the terms containing search_query (case-insensitive, literal substring)."""
+    query = search_query.lower()
+    if len(query) < 3:
+        # Too short for trigrams; scan every unique term
+        candidates = np.arange(len(term_categories))
+    else:
+        index = build_term_trigram_index(term_categories)
+        # A match must contain every trigram of the query; intersect from the rarest up
+        postings = sorted(
+            (index.get(query[i:i + 3], np.empty(0, dtype=np.int64)) for i in range(len(query) - 2)),
+            key=len
+        )
+        candidates = postings[0]
+        for positions in postings[1:]:
+            if len(candidates) == 0:
+                break
+            candidates = np.intersect1d(candidates, positions, assume_unique=True)
+    # Trigrams only narrow the candidates; confirm the full substring on those
+    return candidates[contains_literal(term_categories[candidates], search_query)]
+
+
 def search_term(df: pd.DataFrame, search_query: str) -> pd.DataFrame:
     """Search for a specific term in the data."""
     if df is None:
         return pd.DataFrame()
     
-    # Search by term name (case-insensitive)
-    results = df[df['term_name'].str.contains(search_query, case=False, na=False)]
+    term_names = df['term_name']
     
-    if len(results) == 0:
-        # Also search by extracted software name (before colon)
-        df_copy = df.copy()
-        df_copy['software_name'] = df_copy['term_name'].apply(
-            lambda x: x.split(':')[0].strip() if ':' in str(x) else str(x)
-        )
-        results = df_copy[df_copy['software_name'].str.contains(search_query, case=False, na=False)]
-    
-    return results
+    # The software name (before the colon) is part of the term name, so matching the term name covers both
+    # (case-insensitive, literal substring)
+    if isinstance(term_names.dtype, pd.CategoricalDtype):
+        # Look the query up among the unique terms, then select their rows by category code
+        matching = matching_term_positions(term_names.cat.categories, search_query)
+        mask = np.isin(term_names.cat.codes.to_numpy(), matching)
+    else:
+        mask = contains_literal(term_names, search_query)
+    return df[mask]
 
 
 def get_available_ner_models():
@@ -159,6 +250,7 @@ def load_ner_model(model_name: str):
                 model=model_name,
                 tokenizer=model_name,
                 aggregation_strategy="simple",
+                batch_size=NER_BATCH_SIZE,
                 device=0 if torch.cuda.is_available() else -1
             )
             return {"pipeline": ner_pipeline, "status": "success"}
@@ -187,54 +279,73 @@ def chunk_text(text: str, max_tokens: int = 512, overlap: int = 50):
     return chunks
 
 
-def run_ner_on_context(context: str, model_name: str):
-    """Run NER model on given context."""
+def run_ner_on_contexts(contexts: List[str], model_name: str) -> List[Dict[str, Any]]:
+    """Run an NER model over several contexts at once; returns one result per context."""
     try:
         model_info = load_ner_model(model_name)
         
         if model_info["status"] == "error":
-            return {"entities": [], "status": "error", "error": model_info["error"]}
+            return [{"entities": [], "status": "error", "error": model_info["error"]} for _ in contexts]
         
         pipeline_obj = model_info["pipeline"]
+        entities_per_context = [[] for _ in contexts]
         
         if model_name == "adsabs/nasa-smd-ibm-v0.1_NER_DEAL":
-            # Process with INDUS NER using chunking
-            entities = []
-            chunks = chunk_text(context)
+            # Chunks of every context are streamed through the pipeline, whose DataLoader
+            # tokenizes ahead of the model; chunk_owner maps each chunk back to its context
+            chunk_owner = []
             
-            for chunk in chunks:
-                try:
-                    chunk_entities = pipeline_obj(chunk)
-                    for entity in chunk_entities:
-                        entities.append({
-                            "text": entity["word"],
-                            "label": entity["entity_group"], 
-                            "score": round(entity["score"], 4),
-                            "start": entity.get("start", 0),
-                            "end": entity.get("end", len(entity["word"]))
-                        })
-                except Exception as e:
-                    continue
+            def chunk_gen():
+                for i, context in enumerate(contexts):
+                    for chunk in chunk_text(context):
+                        chunk_owner.append(i)
+                        yield chunk
+            
+            def add_entities(i, chunk_entities):
+                for entity in chunk_entities:
+                    entities_per_context[i].append({
+                        "text": entity["word"],
+                        "label": entity["entity_group"], 
+                        "score": round(entity["score"], 4),
+                        "start": entity.get("start", 0),
+                        "end": entity.get("end", len(entity["word"]))
+                    })
+            
+            try:
+                # A chunk is always generated before its result comes back, so chunk_owner[k] is set
+                for k, chunk_entities in enumerate(pipeline_obj(chunk_gen(), batch_size=NER_BATCH_SIZE)):
+                    add_entities(chunk_owner[k], chunk_entities)
+            except Exception:
+                # Fall back to one chunk at a time so a single bad chunk is skipped, not fatal
+                entities_per_context = [[] for _ in contexts]
+                for i, context in enumerate(contexts):
+                    for chunk in chunk_text(context):
+                        try:
+                            add_entities(i, pipeline_obj(chunk))
+                        except Exception:
+                            continue
                     
         elif model_name == "en_core_web_sm":
-            # Process with spaCy
-            doc = pipeline_obj(context)
-            entities = []
-            for ent in doc.ents:
-                entities.append({
-                    "text": ent.text,
-                    "label": ent.label_,
-                    "score": 1.0,  # spaCy doesn't provide confidence scores by default
-                    "start": ent.start_char,
-                    "end": ent.end_char
-                })
-        else:
-            entities = []
+            # Process with spaCy, batching documents through nlp.pipe
+            for i, doc in enumerate(pipeline_obj.pipe(contexts, batch_size=NER_BATCH_SIZE)):
+                for ent in doc.ents:
+                    entities_per_context[i].append({
+                        "text": ent.text,
+                        "label": ent.label_,
+                        "score": 1.0,  # spaCy doesn't provide confidence scores by default
+                        "start": ent.start_char,
+                        "end": ent.end_char
+                    })
         
-        return {"entities": entities, "status": "success"}
+        return [{"entities": entities, "status": "success"} for entities in entities_per_context]
         
     except Exception as e:
-        return {"entities": [], "status": "error", "error": str(e)}
+        return [{"entities": [], "status": "error", "error": str(e)} for _ in contexts]
+
+
+def run_ner_on_context(context: str, model_name: str):
+    """Run NER model on given context."""
+    return run_ner_on_contexts([context], model_name)[0]
 
 
 def render_ner_results(ner_results: Dict[str, Any], context: str):
@@ -313,7 +424,7 @@ def commit_pending_changes():
     if not st.session_state.pending_changes:
         return 0
     
-    delta_path = Path("curation_delta.csv")
+    delta_path = DELTA_PATH
     
     # Convert pending changes to DataFrame
     changes_data = []
@@ -386,6 +497,34 @@ def render_label_curation_widget(row_id: int, current_label: str, context_key: s
                 st.info("No change needed")
 
 
+def select_context(contexts: pd.DataFrame, kind: str, term_name: str):
+    """Render the context picker and curation widget for one tab; returns (context, row_id)."""
+    if len(contexts) == 0:
+        st.info(f"No {kind} contexts available")
+        return None, None
+    
+    context_options = [
+        f"{idx}. {bibcode} - {preview}"
+        for idx, (bibcode, preview) in enumerate(
+            zip(contexts['bibcode'].tolist(), contexts['context_preview'].tolist()), start=1
+        )
+    ]
+    
+    selected_idx = st.selectbox(
+        f"Select {kind} context:",
+        range(len(context_options)),
+        format_func=lambda x: context_options[x],
+        key=f"{kind}_context_{term_name}"
+    )
+    
+    selected_row = contexts.iloc[selected_idx]
+    
+    # Add curation widget
+    st.markdown("**Label Curation:**")
+    render_label_curation_widget(selected_row['row_id'], selected_row['bibcode_label'], f"{kind}_{term_name}")
+    return selected_row['context'], selected_row['row_id']
+
+
 def render_curation_sidebar():
     """Render the curation controls in the sidebar."""
     st.sidebar.markdown("---")
@@ -428,9 +567,25 @@ def render_curation_sidebar():
         st.sidebar.info("No pending changes")
 
 
+def _inject_css():
+    """Add the custom CSS to the page."""
+    # Streamlit drops elements a rerun does not emit again, so the style block is sent on every
+    # run; it is a prebuilt constant, so this is a single small message
+    st.markdown(_CSS, unsafe_allow_html=True)
+
+
 def main():
     """Main dashboard function."""
     
+    # Page configuration (must be the first Streamlit call of the run)
+    st.set_page_config(
+        page_title="Entity Extractor Dashboard",
+        page_icon="🔍",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+    _inject_css()
+    
     # Initialize session state
     initialize_session_state()
     
@@ -490,9 +645,10 @@ def main():
             st.metric("Total Matches", results['match_count'].sum())
         
         # Group by term_name for display
-        grouped = results.groupby('term_name')
+        grouped_positions = results.groupby('term_name', observed=True).indices
         
-        for term_name, group in grouped:
+        for term_name, positions in grouped_positions.items():
+            group = results.iloc[positions]
             with st.expander(f"📦 {term_name} ({len(group)} mentions)", expanded=True):
                 
                 # Show mention details
@@ -507,6 +663,7 @@ def main():
                     
                     # Location distribution
                     location_counts = group['match_location'].value_counts()
+                    location_counts = location_counts[location_counts > 0]
                     st.write("**Locations:**")
                     for location, count in location_counts.items():
                         st.write(f"• {location}: {count}")
@@ -519,97 +676,23 @@ def main():
                     contexts_with_text = group[group['context'].notna() & (group['context'] != '')]
                     
                     if len(contexts_with_text) > 0:
-                        # Categorize contexts based on bibcode_label
-                        positive_contexts = contexts_with_text[contexts_with_text['bibcode_label'] == 'positive']
-                        negative_contexts = contexts_with_text[
-                            (contexts_with_text['bibcode_label'] == 'negative') | 
-                            (contexts_with_text['bibcode_label'] == 'unknown')
-                        ]
-                        uncurated_contexts = contexts_with_text[
-                            ~contexts_with_text['bibcode_label'].isin(['positive', 'negative', 'unknown'])
-                        ]
-                        
-                        # Create tabs for different context categories
-                        tab1, tab2, tab3 = st.tabs([
-                            f"✅ Positive ({len(positive_contexts)})",
-                            f"📝 Uncurated ({len(uncurated_contexts)})",
-                            f"🚫 Negative ({len(negative_contexts)})"
+                        # Split contexts by the tab group precomputed at load
+                        context_groups = contexts_with_text['context_group'].to_numpy()
+                        tabs = st.tabs([
+                            f"{icon} {kind.capitalize()} ({np.count_nonzero(context_groups == kind)})"
+                            for icon, kind in zip(["✅", "📝", "🚫"], CONTEXT_GROUPS)
                         ])
                         
                         selected_context = None
                         selected_row_id = None
                         
-                        with tab1:
-                            if len(positive_contexts) > 0:
-                                context_options = []
-                                for idx, (_, row) in enumerate(positive_contexts.iterrows()):
-                                    preview = str(row['context'])[:50] + "..." if len(str(row['context'])) > 50 else str(row['context'])
-                                    context_options.append(f"{idx+1}. {row['bibcode']} - {preview}")
-                                
-                                selected_idx = st.selectbox(
-                                    "Select positive context:",
-                                    range(len(context_options)),
-                                    format_func=lambda x: context_options[x],
-                                    key=f"positive_context_{term_name}"
-                                )
-                                
-                                selected_row = positive_contexts.iloc[selected_idx]
-                                selected_context = selected_row['context']
-                                selected_row_id = selected_row['row_id']
-                                
-                                # Add curation widget
-                                st.markdown("**Label Curation:**")
-                                render_label_curation_widget(selected_row_id, selected_row['bibcode_label'], f"positive_{term_name}")
-                            else:
-                                st.info("No positive contexts available")
-                        
-                        with tab2:
-                            if len(uncurated_contexts) > 0:
-                                context_options = []
-                                for idx, (_, row) in enumerate(uncurated_contexts.iterrows()):
-                                    preview = str(row['context'])[:50] + "..." if len(str(row['context'])) > 50 else str(row['context'])
-                                    context_options.append(f"{idx+1}. {row['bibcode']} - {preview}")
-                                
-                                selected_idx = st.selectbox(
-                                    "Select uncurated context:",
-                                    range(len(context_options)),
-                                    format_func=lambda x: context_options[x],
-                                    key=f"uncurated_context_{term_name}"
+                        for tab, kind in zip(tabs, CONTEXT_GROUPS):
+                            with tab:
+                                context, row_id = select_context(
+                                    contexts_with_text[context_groups == kind], kind, term_name
                                 )
-                                
-                                selected_row = uncurated_contexts.iloc[selected_idx]
-                                selected_context = selected_row['context']
-                                selected_row_id = selected_row['row_id']
-                                
-                                # Add curation widget
-                                st.markdown("**Label Curation:**")
-                                render_label_curation_widget(selected_row_id, selected_row['bibcode_label'], f"uncurated_{term_name}")
-                            else:
-                                st.info("No uncurated contexts available")
-                        
-                        with tab3:
-                            if len(negative_contexts) > 0:
-                                context_options = []
-                                for idx, (_, row) in enumerate(negative_contexts.iterrows()):
-                                    preview = str(row['context'])[:50] + "..." if len(str(row['context'])) > 50 else str(row['context'])
-                                    context_options.append(f"{idx+1}. {row['bibcode']} - {preview}")
-                                
-                                selected_idx = st.selectbox(
-                                    "Select negative context:",
-                                    range(len(context_options)),
-                                    format_func=lambda x: context_options[x],
-                                    key=f"negative_context_{term_name}"
-                                )
-                                
-                                selected_row = negative_contexts.iloc[selected_idx]
-                                selected_context = selected_row['context']
-                                selected_row_id = selected_row['row_id']
-                                
-                                # Add curation widget
-                                st.markdown("**Label Curation:**")
-                                render_label_curation_widget(selected_row_id, selected_row['bibcode_label'], f"negative_{term_name}")
-                            else:
-                                st.info("No negative contexts available")
+                                if context is not None:
+                                    selected_context, selected_row_id = context, row_id
                         
                         # Show original context (only if one is selected)
                         if selected_context:
@@ -630,6 +713,26 @@ def main():
                             st.info("Select NER models to analyze contexts")
                         elif not selected_context:
                             st.info("Select a context from the tabs above to run NER analysis")
+                        
+                        # Run each selected model over every context of this term in one batch
+                        if selected_models:
+                            all_contexts = contexts_with_text[['row_id', 'bibcode', 'context']]
+                            for model_name in selected_models:
+                                if st.button(f"Run {model_name} on all {len(all_contexts)} contexts", key=f"ner_all_{term_name}_{model_name}"):
+                                    with st.spinner(f"Running {model_name} on {len(all_contexts)} contexts..."):
+                                        batch_results = run_ner_on_contexts(all_contexts['context'].astype(str).tolist(), model_name)
+                                    errors = [r['error'] for r in batch_results if r['status'] == 'error']
+                                    if errors:
+                                        st.error(f"❌ NER Error: {errors[0]}")
+                                    else:
+                                        entity_rows = [
+                                            {"row_id": row_id, "bibcode": bibcode, **entity}
+                                            for row_id, bibcode, result in zip(all_contexts['row_id'], all_contexts['bibcode'], batch_results)
+                                            for entity in result["entities"]
+                                        ]
+                                        st.success(f"✅ Found {len(entity_rows)} entities across {len(all_contexts)} contexts")
+                                        if entity_rows:
+                                            st.dataframe(pd.DataFrame(entity_rows), use_container_width=True)
                     else:
                         st.info("No contexts available for this software")
                 
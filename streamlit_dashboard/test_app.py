@@ -4,20 +4,26 @@
 import sys
 from pathlib import Path
 import pandas as pd
+import pyarrow.parquet as pq
 
 # Add the parent directory to the path
 sys.path.append(str(Path(__file__).parent.parent))
 
+# Extraction export written by run_extraction.py by default
+EXPORT_PATH = Path("../optimized_extractor/results/exports/software_mentions_all.parquet")
+
+def read_sample(nrows: int) -> pd.DataFrame:
+    """First nrows records of the extraction export."""
+    return next(pq.ParquetFile(EXPORT_PATH).iter_batches(batch_size=nrows)).to_pandas()
+
 def test_load_data():
     """Test loading the software mentions data."""
-    csv_path = Path("../optimized_extractor/results/exports/software_mentions_all.csv.gzip")
-    
-    if not csv_path.exists():
-        print(f"❌ Data file not found at {csv_path}")
+    if not EXPORT_PATH.exists():
+        print(f"❌ Data file not found at {EXPORT_PATH}")
         return False
     
     try:
-        df = pd.read_csv(csv_path, compression='gzip', nrows=100)
+        df = read_sample(100)
         print(f"✅ Successfully loaded {len(df)} sample records")
         print(f"Columns: {list(df.columns)}")
         print(f"Sample term names: {df['term_name'].head(3).tolist()}")
@@ -31,8 +37,7 @@ def test_search_functionality():
     from app import search_term, load_software_mentions_data
     
     # Load a small sample
-    csv_path = Path("../optimized_extractor/results/exports/software_mentions_all.csv.gzip")
-    df = pd.read_csv(csv_path, compression='gzip', nrows=1000)
+    df = read_sample(1000)
     
     # Test search
     results = search_term(df, "astropy")